@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+def lifting_sets(df):
+    """Sets with a positive weight and rep count, oldest first."""
+    if df.empty or not {'weight_kg', 'reps'}.issubset(df.columns):
+        return df.iloc[0:0]
+    df = df[(df['weight_kg'] > 0) & (df['reps'] > 0)]
+    return df.sort_values('start_time', kind='stable')
+
+def weight_prs(df, single_reps=False):
+    """Sets that beat every earlier weight for the exercise, heaviest first.
+
+    Mirrors the client's calculatePRs: a set is a PR when its weight exceeds the
+    running maximum of all earlier sets.
+    """
+    df = lifting_sets(df)
+    if single_reps:
+        df = df[df['reps'] == 1]
+    previous_max = df['weight_kg'].cummax().shift(fill_value=0)
+    prs = df[df['weight_kg'] > previous_max]
+    prs = prs.rename(columns={'start_time': 'date', 'weight_kg': 'weight'})
+    return prs[['date', 'weight', 'reps']].sort_values('weight', ascending=False, kind='stable')
+
+def estimated_one_rep_max(weight, reps):
+    """Brzycki estimate weight * 36 / (37 - reps), never below the lifted weight."""
+    weight = np.asarray(weight, dtype=float)
+    reps = np.asarray(reps, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        brzycki = np.where(reps < 37, weight * (36 / (37 - reps)), weight)
+    return np.maximum(brzycki, weight)
+
+def e1rm_prs(df):
+    """First set reaching each rounded estimated 1RM, highest first.
+
+    Mirrors the client's calculateOneRepMaxPRs.
+    """
+    df = lifting_sets(df)
+    e1rm = estimated_one_rep_max(df['weight_kg'], df['reps'])
+    # Round half up like Math.round rather than NumPy's round half to even
+    result = pd.DataFrame({
+        'date': df['start_time'],
+        'weight': df['weight_kg'],
+        'reps': df['reps'],
+        'oneRepMax': np.floor(e1rm + 0.5),
+    })
+    result = result.drop_duplicates('oneRepMax', keep='first')
+    return result.sort_values('oneRepMax', ascending=False, kind='stable')
+
+def top_sets(df):
+    """Heaviest set per (start_time, exercise_title), oldest first.
+
+    On ties the earliest set in the input wins, as in the client's top-set filter.
+    """
+    if df.empty:
+        return df
+    df = df.sort_values('weight_kg', ascending=False, kind='stable', na_position='last')
+    df = df.drop_duplicates(['start_time', 'exercise_title'], keep='first')
+    return df.sort_values('start_time', kind='stable')
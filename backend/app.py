@@ -1,13 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from pymongo import MongoClient
 import pandas as pd
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import logging
+import json
+import itertools
+import base64
+import functools
+import hashlib
+import threading
 import traceback
-import numpy as np
+import time
+import cProfile
+import io
+import pstats
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+from validation import validate_workouts_frame, frame_to_records, SetKeys, NUMERIC_FIELDS, SET_FIELDS
+from analytics import weight_prs, e1rm_prs, top_sets
+from cache import ResponseCache
+from columnar import frame_to_columnar, COLUMNAR_MIMETYPE
+from series import build_series, DATE_AXES
+from rollups import PERIODS
+from storage import utcnow
+from bulk_import import plan_parts, parse_parallel, is_supported, CrossFileDuplicates, SUPPORTED_EXTENSIONS
+from metrics import registry, span, RssSampler, PROMETHEUS_MIMETYPE, REQUEST_SECONDS, SPAN_SECONDS, UPLOAD_ROWS, UPLOAD_REJECTIONS, RESPONSE_CACHE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,80 +39,830 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')) #TODO: replace with propper mongobd
-db = client['workout_tracker']
-workouts_collection = db['workouts']
+# Where sets, rollups, upload jobs and shared metadata live: 'mongo', or 'column' for
+# memory-mapped column files under COLUMN_STORE_DIR, partitioned by exercise
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')
+COLUMN_STORE_DIR = os.getenv('COLUMN_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+# Appended segments per exercise before the column store merges them back into one
+COLUMN_STORE_MAX_SEGMENTS = int(os.getenv('COLUMN_STORE_MAX_SEGMENTS', '8'))
 
-def validate_workout(workout):
-    """Validate workout data and handle NaN values."""
+# MongoDB connection pool settings, applied per worker process
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+
+# How long upload job statuses are kept, in seconds
+UPLOAD_JOB_TTL = int(os.getenv('UPLOAD_JOB_TTL', str(7 * 24 * 3600)))
+
+# Number of CSV rows parsed, validated and inserted at a time in streaming mode
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', '50000'))
+
+# Documents fetched per cursor round trip (and per streamed response chunk) when reading workouts
+WORKOUTS_BATCH_SIZE = int(os.getenv('WORKOUTS_BATCH_SIZE', '2000'))
+
+# Async uploads are spooled here and processed by a small pool; ingests never run concurrently
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'hevy-uploads'))
+UPLOAD_JOB_WORKERS = int(os.getenv('UPLOAD_JOB_WORKERS', '1'))
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_JOB_WORKERS, thread_name_prefix='upload-job')
+# Seconds an ingest holds the cross-process lock without renewing it, and how often waiters retry
+INGEST_LOCK_LEASE = float(os.getenv('INGEST_LOCK_LEASE', '60'))
+INGEST_LOCK_POLL = float(os.getenv('INGEST_LOCK_POLL', '0.5'))
+
+# Bulk imports parse and validate in this many processes, splitting plain CSVs over
+# BULK_IMPORT_SPLIT_BYTES into byte ranges, and write valid sets BULK_IMPORT_BATCH_ROWS at a time
+BULK_IMPORT_WORKERS = int(os.getenv('BULK_IMPORT_WORKERS', str(os.cpu_count() or 1)))
+BULK_IMPORT_SPLIT_BYTES = int(os.getenv('BULK_IMPORT_SPLIT_BYTES', str(64 * 1024 * 1024)))
+BULK_IMPORT_BATCH_ROWS = int(os.getenv('BULK_IMPORT_BATCH_ROWS', '100000'))
+
+# Point budget of /api/series when the request does not set one, and the largest it may ask for
+SERIES_DEFAULT_POINTS = int(os.getenv('SERIES_DEFAULT_POINTS', '1000'))
+SERIES_MAX_POINTS = int(os.getenv('SERIES_MAX_POINTS', '10000'))
+
+# Read endpoints cache serialized responses until the next upload bumps the dataset version
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_ENTRIES', '256')),
+    max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    gzip_min_bytes=int(os.getenv('RESPONSE_CACHE_GZIP_MIN_BYTES', '1024')),
+)
+# How long a worker trusts its copy of the dataset version before re-reading it from the store
+DATASET_VERSION_TTL = float(os.getenv('DATASET_VERSION_TTL', '1'))
+_dataset_version = {'value': None, 'checked_at': 0.0}
+_dataset_version_lock = threading.Lock()
+
+store = None
+_store_key = None
+
+def connect_store():
+    """Open this process's storage backend, as selected by STORAGE_BACKEND.
+
+    MongoClient is not fork-safe, so a server that forks workers after importing the
+    app (e.g. gunicorn with preload_app) calls this again in each worker.
+    """
+    global store, _store_key
+    backend = os.getenv('STORAGE_BACKEND', STORAGE_BACKEND)
+    if _store_key == (os.getpid(), backend):
+        return
+    if backend == 'column':
+        from column_store import ColumnStore
+        store = ColumnStore(os.getenv('COLUMN_STORE_DIR', COLUMN_STORE_DIR), max_segments=COLUMN_STORE_MAX_SEGMENTS,
+                            batch_size=WORKOUTS_BATCH_SIZE, job_ttl=UPLOAD_JOB_TTL)
+    elif backend == 'mongo':
+        from mongo_store import MongoStore
+        store = MongoStore(
+            os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'), #TODO: replace with propper mongobd
+            os.getenv('MONGODB_DB', 'workout_tracker'),
+            batch_size=WORKOUTS_BATCH_SIZE,
+            job_ttl=UPLOAD_JOB_TTL,
+            lock_lease=INGEST_LOCK_LEASE,
+            lock_poll=INGEST_LOCK_POLL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        )
+        store.ensure_indexes()
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend} (expected 'mongo' or 'column')")
+    _store_key = (os.getpid(), backend)
+    # Responses cached for another backend's data are no longer valid
+    response_cache.clear()
+    with _dataset_version_lock:
+        _dataset_version['checked_at'] = 0.0
+
+connect_store()
+
+# ?profile=1 returns a cProfile report instead of the response; off by default since it exposes internals
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', '40'))
+# Only one profiler can be active per process
+_profile_lock = threading.Lock()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILING_ENABLED and request.args.get('profile') == '1':
+        if not _profile_lock.acquire(blocking=False):
+            return jsonify({'error': 'Another request is being profiled'}), 409
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_time(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # Streamed bodies are produced lazily, so drain them while the profiler is still running
+        response.get_data()
+        profiler.disable()
+        _profile_lock.release()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        response = Response(report.getvalue(), mimetype='text/plain')
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint,
+                                status=response.status_code)
+    return response
+
+@app.teardown_request
+def release_profiler(exc):
+    # Requests that failed before after_request still have to give the profiler back
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+def record_accepted(count):
+    UPLOAD_ROWS.inc(count, outcome='accepted')
+
+def log_rejections(reasons):
+    """Log one summary line per rejection reason instead of one per row."""
+    return log_rejection_counts(pd.Series(reasons).dropna().value_counts().items())
+
+def log_rejection_counts(counts):
+    """Log and count (reason, count) pairs of rejected rows, returning the total."""
+    total = 0
+    for reason, count in counts:
+        logger.warning(f"Rejected {count} invalid workouts: {reason}")
+        UPLOAD_REJECTIONS.inc(int(count), reason=reason)
+        total += int(count)
+    UPLOAD_ROWS.inc(total, outcome='rejected')
+    return total
+
+def json_default(value):
+    """Serialize values the json module does not handle natively."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def stream_documents(documents, close, ndjson=False):
+    """Yield documents as a JSON array (or NDJSON), one chunk per batch, calling close when done."""
+    prefix = '' if ndjson else '['
+    count = 0
+    batch = []
+    # Fetching and serializing interleave, so each is timed cumulatively and recorded once
+    fetch_seconds = serialize_seconds = 0.0
+    documents = iter(documents)
     try:
-        # Convert NaN values to None for MongoDB compatibility
-        for key, value in workout.items():
-            if pd.isna(value) or (isinstance(value, float) and np.isnan(value)):
-                workout[key] = None
+        while True:
+            started = time.perf_counter()
+            document = next(documents, None)
+            fetched = time.perf_counter()
+            fetch_seconds += fetched - started
+            if document is None:
+                break
+            batch.append(json.dumps(document, separators=(',', ':'), default=json_default))
+            serialize_seconds += time.perf_counter() - fetched
+            if len(batch) >= WORKOUTS_BATCH_SIZE:
+                count += len(batch)
+                yield prefix + ('\n'.join(batch) + '\n' if ndjson else ','.join(batch))
+                prefix = '' if ndjson else ','
+                batch = []
+        count += len(batch)
+        if batch:
+            yield prefix + ('\n'.join(batch) + '\n' if ndjson else ','.join(batch))
+        elif not ndjson and not count:
+            yield prefix
+        if not ndjson:
+            yield ']'
+    finally:
+        close()
+        SPAN_SECONDS.observe(fetch_seconds, span=store.read_span)
+        SPAN_SECONDS.observe(serialize_seconds, span='json_serialize')
+        logger.info(f"Streamed {count} workouts")
 
-        # Ensure required fields are present and have valid types
-        if not workout.get('start_time'):
-            return False, "Missing start_time"
-        
-        if not workout.get('exercise_title'):
-            return False, "Missing exercise_title"
-        
-        # Convert numeric fields, handling None values
-        for field in ['weight_kg', 'reps', 'distance_km', 'duration_seconds', 'rpe']:
-            if field in workout and workout[field] is not None:
-                try:
-                    workout[field] = float(workout[field])
-                except (ValueError, TypeError):
-                    workout[field] = None
+def encode_page_cursor(key):
+    """Encode the (start_time, tiebreaker) sort key of the last set on a page."""
+    start_time, tiebreaker = key
+    key = {
+        'start_time': start_time.isoformat() if isinstance(start_time, datetime) else start_time,
+        'key': tiebreaker,
+    }
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_page_cursor(token):
+    """Decode a page cursor produced by encode_page_cursor."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode()))
+        start_time = key['start_time']
+        if start_time is not None:
+            start_time = datetime.fromisoformat(start_time)
+        if not isinstance(key['key'], str):
+            raise ValueError
+        return start_time, key['key']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def parse_date_arg(name, end_of_day=False):
+    """Parse an optional date query argument into a datetime.
+
+    With end_of_day, a date without a time of day means its last microsecond, so that
+    ?to=2024-03-01 includes the sets of March 1st.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = pd.to_datetime(value, errors='coerce')
+    if pd.isna(parsed):
+        raise ValueError(f"Invalid date for '{name}': {value}")
+    if end_of_day and ':' not in value and parsed == parsed.normalize():
+        parsed += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return parsed.to_pydatetime()
+
+def filter_args(exercise=None):
+    """Store filter arguments for the exercise and from/to date-range query arguments."""
+    if exercise is None:
+        exercise = request.args.get('exercise', 'All')
+    return {
+        'exercise': None if exercise == 'All' else exercise,
+        'date_from': parse_date_arg('from'),
+        'date_to': parse_date_arg('to', end_of_day=True),
+    }
+
+def parse_workouts_args():
+    """Translate /api/workouts query arguments into filters, fields, sort order, page key and limit."""
+    filters = filter_args()
+
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    after = request.args.get('after')
+    after = decode_page_cursor(after) if after else None
+
+    limit = int(request.args['limit']) if 'limit' in request.args else None
+    if limit is not None and limit <= 0:
+        raise ValueError('limit must be a positive integer')
+    if limit is None and 'order' not in request.args:
+        order = None
+
+    return filters, fields_arg(), order, after, limit
 
-        return True, workout
+def fields_arg():
+    """The comma-separated fields argument as a list, rejecting names that are not set columns."""
+    fields = [field for field in request.args.get('fields', '').split(',') if field]
+    unknown = [field for field in fields if field not in SET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def json_response(data):
+    """Serialize data with json_default so dates match the streamed /api/workouts output."""
+    with span('json_serialize'):
+        body = json.dumps(data, separators=(',', ':'), default=json_default)
+    return Response(body, mimetype='application/json')
+
+def dataset_version():
+    """Current dataset version, shared between workers through the store."""
+    with _dataset_version_lock:
+        if time.monotonic() - _dataset_version['checked_at'] >= DATASET_VERSION_TTL:
+            _dataset_version['value'] = store.dataset_version()
+            _dataset_version['checked_at'] = time.monotonic()
+        return _dataset_version['value']
+
+def bump_dataset_version():
+    """Invalidate cached responses after the stored sets changed."""
+    version = store.bump_dataset_version()
+    with _dataset_version_lock:
+        _dataset_version['value'] = version
+        _dataset_version['checked_at'] = time.monotonic()
+    response_cache.clear()
+
+def cache_streamed_body(chunks, cache_key, mimetype):
+    """Pass streamed chunks through, caching the full body once it has been sent."""
+    parts = []
+    size = 0
+    try:
+        for chunk in chunks:
+            yield chunk
+            if parts is not None:
+                parts.append(chunk.encode() if isinstance(chunk, str) else chunk)
+                size += len(parts[-1])
+                if size > response_cache.max_bytes:
+                    parts = None
+        if parts is not None:
+            response_cache.put(cache_key, b''.join(parts), mimetype)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def cached_response(view):
+    """Serve a read endpoint from the response cache, answering If-None-Match with 304."""
+    def tagged(response, etag):
+        # Bodies are negotiated on Accept (JSON, NDJSON or columnar) as well as Accept-Encoding
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        response.set_etag(etag, weak=True)
+        return response
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = dataset_version()
+        key = (request.path, tuple(sorted(request.args.items(multi=True))), request.headers.get('Accept', ''))
+        etag = f"{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}"
+        if request.if_none_match.contains_weak(etag):
+            RESPONSE_CACHE.inc(result='not_modified')
+            return tagged(Response(status=304), etag)
+
+        cache_key = (version,) + key
+        entry = response_cache.get(cache_key)
+        RESPONSE_CACHE.inc(result='miss' if entry is None else 'hit')
+        if entry is None:
+            response = view(*args, **kwargs)
+            if isinstance(response, tuple) or response.status_code != 200:
+                return response
+            if response.is_streamed:
+                response.response = cache_streamed_body(response.response, cache_key, response.mimetype)
+                return tagged(response, etag)
+            entry = response_cache.put(cache_key, response.get_data(), response.mimetype)
+            if entry is None:
+                return tagged(response, etag)
+
+        if entry['gzip'] is not None and 'gzip' in request.accept_encodings:
+            response = Response(entry['gzip'], mimetype=entry['mimetype'])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(entry['body'], mimetype=entry['mimetype'])
+        return tagged(response, etag)
+    return wrapper
+
+def stream_upload(file, incremental=False, progress=None):
+    """Ingest a CSV upload chunk by chunk so memory stays flat regardless of file size.
+
+    In incremental mode rows get set_keys and are upserted instead of replacing the stored sets.
+    Otherwise the stored sets are cleared at the first chunk with valid rows, so this is not
+    atomic: a file that fails to parse later leaves only its first chunks (see replace_upload).
+    progress, when given, is called as progress(phase, counts) whenever a chunk changes phase.
+    """
+    started = time.perf_counter()
+    total_rows = inserted = updated = unchanged = rejected = 0
+
+    def report(phase):
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(phase, {
+                'rows_read': total_rows, 'inserted': inserted, 'updated': updated,
+                'unchanged': unchanged, 'rejected': rejected,
+                'rows_per_second': round(total_rows / elapsed, 1) if elapsed > 0 else None,
+            })
+
+    written = False
+    keys = SetKeys()
+    with RssSampler() as rss:
+        try:
+            if incremental:
+                written = store.ensure_set_keys() > 0
+            chunks = pd.read_csv(file, chunksize=UPLOAD_CHUNK_SIZE)
+            while True:
+                report('parsing')
+                with span('csv_parse'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                total_rows += len(chunk)
+                report('validating')
+                with span('validation'):
+                    valid, reasons = validate_workouts_frame(chunk)
+                rejected += log_rejections(reasons)
+                record_accepted(len(valid))
+                if len(valid):
+                    report('writing')
+                if len(valid) and incremental:
+                    written = True
+                    valid['set_key'] = keys.assign(valid)
+                    chunk_inserted, chunk_updated, chunk_unchanged = store.upsert_sets(valid)
+                    inserted += chunk_inserted
+                    updated += chunk_updated
+                    unchanged += chunk_unchanged
+                elif len(valid):
+                    # Only clear existing workouts once we know the file contains valid data
+                    if not written:
+                        store.clear()
+                        written = True
+                    inserted += store.insert_sets(valid)
+                logger.debug(f"Streamed chunk: {total_rows} rows read, {inserted} inserted, {updated} updated")
+        finally:
+            if written:
+                bump_dataset_version()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'rows_read': total_rows,
+        'inserted': inserted,
+        'rejected': rejected,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(total_rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': rss.peak_mb,
+    }
+    if incremental:
+        stats.update({'updated': updated, 'unchanged': unchanged})
+    logger.info(f"Streaming upload finished: {stats}")
+    return stats
+
+def replace_upload(file, progress=None):
+    """Replace every stored set with the valid rows of a CSV upload.
+
+    Unlike stream_upload, the whole file is parsed and validated before the stored sets are
+    cleared, so a malformed row anywhere in it leaves them untouched. Takes as much memory
+    as the parsed file. progress is called like stream_upload's.
+    """
+    started = time.perf_counter()
+    counts = {'rows_read': 0, 'inserted': 0, 'rejected': 0}
+
+    def report(phase):
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(phase, {**counts, 'rows_per_second': round(counts['rows_read'] / elapsed, 1) if elapsed > 0 else None})
+
+    report('parsing')
+    with span('csv_parse'):
+        df = pd.read_csv(file)
+    counts['rows_read'] = len(df)
+    logger.info(f"Read {len(df)} rows from CSV file")
+    logger.debug(f"CSV columns: {df.columns.tolist()}")
+
+    report('validating')
+    with span('validation'):
+        valid, reasons = validate_workouts_frame(df)
+    counts['rejected'] = log_rejections(reasons)
+    record_accepted(len(valid))
+
+    if len(valid):
+        report('writing')
+        try:
+            store.clear()
+            counts['inserted'] = store.insert_sets(valid)
+        finally:
+            bump_dataset_version()
+        logger.info(f"Successfully inserted {counts['inserted']} workouts")
+    elapsed = time.perf_counter() - started
+    return {
+        **counts,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(counts['rows_read'] / elapsed, 1) if elapsed > 0 else None,
+    }
+
+def bulk_import(paths, incremental=False, progress=None):
+    """Import several CSV exports, zip archives of CSVs or gzipped CSVs at once.
+
+    Files (and byte ranges of large CSVs) are parsed and validated in a pool of
+    BULK_IMPORT_WORKERS processes. Sets repeated across files are only taken from the first
+    file that has them, and valid sets are written BULK_IMPORT_BATCH_ROWS at a time. Like
+    stream_upload, replace mode only clears the stored sets once there is something to write.
+    Returns stats including the seconds spent per stage; parse and validate add up across workers.
+    """
+    started = time.perf_counter()
+    counts = {'rows_read': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'rejected': 0}
+    stages = dict.fromkeys(['plan', 'parse', 'validate', 'dedupe', 'write'], 0.0)
+
+    def report(phase):
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(phase, {**counts, 'rows_per_second': round(counts['rows_read'] / elapsed, 1) if elapsed > 0 else None})
+
+    report('planning')
+    parts = plan_parts(paths, BULK_IMPORT_SPLIT_BYTES)
+    stages['plan'] = time.perf_counter() - started
+    duplicates = CrossFileDuplicates()
+    keys, keyed_file = None, None
+    batch = []
+    written = False
+
+    def write_batch():
+        nonlocal written
+        frame = pd.concat(batch, ignore_index=True) if len(batch) > 1 else batch[0]
+        batch.clear()
+        report('writing')
+        write_started = time.perf_counter()
+        if incremental:
+            inserted, updated, unchanged = store.upsert_sets(frame)
+            counts['updated'] += updated
+            counts['unchanged'] += unchanged
+        else:
+            if not written:
+                store.clear()
+            inserted = store.insert_sets(frame)
+        written = True
+        counts['inserted'] += inserted
+        stages['write'] += time.perf_counter() - write_started
+
+    with RssSampler() as rss:
+        try:
+            if incremental:
+                written = store.ensure_set_keys() > 0
+            report('parsing')
+            for result in parse_parallel(parts, BULK_IMPORT_WORKERS):
+                SPAN_SECONDS.observe(result['parse_seconds'], span='csv_parse')
+                SPAN_SECONDS.observe(result['validate_seconds'], span='validation')
+                stages['parse'] += result['parse_seconds']
+                stages['validate'] += result['validate_seconds']
+                counts['rows_read'] += result['rows']
+                counts['rejected'] += log_rejection_counts(result['rejections'].items())
+
+                dedupe_started = time.perf_counter()
+                with span('dedupe'):
+                    # Occurrences are counted per file, across its byte ranges
+                    if result['file'] != keyed_file:
+                        keys, keyed_file = SetKeys(), result['file']
+                    valid = result['valid']
+                    valid['set_key'] = keys.keys(result['bases'])
+                    valid, repeated = duplicates.filter(valid, result['file'])
+                stages['dedupe'] += time.perf_counter() - dedupe_started
+                counts['duplicates'] += repeated
+                UPLOAD_ROWS.inc(repeated, outcome='duplicate')
+                record_accepted(len(valid))
+                if len(valid):
+                    batch.append(valid)
+                if sum(map(len, batch)) >= BULK_IMPORT_BATCH_ROWS:
+                    write_batch()
+                report('parsing')
+            if batch:
+                write_batch()
+        finally:
+            if written:
+                bump_dataset_version()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'files': len(paths),
+        'parts': len(parts),
+        'workers': BULK_IMPORT_WORKERS,
+        **counts,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(counts['rows_read'] / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': rss.peak_mb,
+        'stages': {stage: round(seconds, 3) for stage, seconds in stages.items()},
+    }
+    if not incremental:
+        del stats['updated'], stats['unchanged']
+    logger.info(f"Bulk import finished: {stats}")
+    return stats
+
+def spool_files(job_id, files):
+    """Save uploaded files under UPLOAD_SPOOL_DIR/<job_id>, returning their paths in upload order."""
+    directory = os.path.join(UPLOAD_SPOOL_DIR, job_id)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, file in enumerate(files):
+        path = os.path.join(directory, f'{i}-{secure_filename(file.filename)}')
+        file.save(path)
+        paths.append(path)
+    return paths
+
+def run_upload_job(job_id, paths, ingest):
+    """Run ingest(paths, progress) on a spooled upload, recording phase and progress on the job document."""
+    def progress(phase, counts):
+        store.update_job(job_id, phase=phase, **counts)
+
+    try:
+        with store.ingest_lock(job_id):
+            store.update_job(job_id, status='running', phase='starting', started_at=utcnow())
+            stats = ingest(paths, progress)
+        if not stats['inserted'] + stats.get('updated', 0) + stats.get('unchanged', 0):
+            store.update_job(job_id, status='failed', phase='done', error='No valid workouts found in the file',
+                             finished_at=utcnow(), **stats)
+        else:
+            store.update_job(job_id, status='done', phase='done', finished_at=utcnow(), **stats)
     except Exception as e:
-        logger.error(f"Error validating workout: {str(e)}")
-        return False, str(e)
+        logger.error(f"Upload job {job_id} failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        store.update_job(job_id, status='failed', error=str(e), finished_at=utcnow())
+    finally:
+        shutil.rmtree(os.path.join(UPLOAD_SPOOL_DIR, job_id), ignore_errors=True)
+
+def start_upload_job(files, mode, ingest):
+    """Spool the uploaded files to disk and queue ingest(paths, progress), returning the job document."""
+    job_id = uuid.uuid4().hex
+    paths = spool_files(job_id, files)
+    job = {
+        '_id': job_id, 'status': 'queued', 'phase': 'queued', 'mode': mode,
+        'filename': ', '.join(file.filename for file in files),
+        'size_bytes': sum(os.path.getsize(path) for path in paths), 'created_at': utcnow(),
+        'rows_read': 0, 'inserted': 0, 'rejected': 0, 'error': None,
+    }
+    store.create_job(job)
+    upload_executor.submit(run_upload_job, job_id, paths, ingest)
+    return job
+
+def queued_response(job, mode):
+    status_url = f"/api/upload/{job['_id']}"
+    logger.info(f"Queued upload job {job['_id']} ({job['size_bytes']} bytes, {mode} mode)")
+    return jsonify({'job_id': job['_id'], 'status': job['status'], 'status_url': status_url}), 202, \
+        {'Location': status_url}
 
 @app.route('/api/workouts', methods=['GET'])
+@cached_response
 def get_workouts():
     try:
         exercise = request.args.get('exercise', 'All')
-        logger.info(f"Fetching workouts for exercise: {exercise}")
-        
-        query = {} if exercise == 'All' else {'exercise_title': exercise}
-        logger.info(f"Using query: {query}")
-        
-        workouts = list(workouts_collection.find(query, {'_id': 0}))
-        logger.info(f"Retrieved {len(workouts)} workouts from database")
-        
-        # Validate workouts before sending
-        valid_workouts = []
-        for workout in workouts:
-            is_valid, result = validate_workout(workout)
-            if is_valid:
-                valid_workouts.append(result)
+        logger.debug(f"Fetching workouts for exercise: {exercise}")
+
+        try:
+            filters, fields, order, after, limit = parse_workouts_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        accept = request.headers.get('Accept', '')
+        columnar = request.args.get('format') == 'columnar' or COLUMNAR_MIMETYPE in accept
+        ndjson = request.args.get('format') == 'ndjson' or 'application/x-ndjson' in accept
+        mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+
+        if limit is None and columnar:
+            if order is None:
+                frame = store.scan(**filters, columns=fields or None)
             else:
-                logger.warning(f"Invalid workout data: {result}")
-        
-        logger.info(f"Returning {len(valid_workouts)} valid workouts")
-        return jsonify(valid_workouts)
+                documents, close = store.iter_sets(**filters, fields=fields, order=order)
+                try:
+                    with span(store.read_span):
+                        frame = pd.DataFrame.from_records(documents, columns=fields or None)
+                finally:
+                    close()
+            with span('json_serialize'):
+                body = json.dumps(frame_to_columnar(frame), separators=(',', ':'))
+            return Response(body, mimetype=COLUMNAR_MIMETYPE)
+
+        if limit is None:
+            # Sets are validated at upload time, so they are streamed straight from the store
+            documents, close = store.iter_sets(**filters, fields=fields, order=order)
+            # Pull the first document eagerly so query errors still produce a 500 response
+            first = next(documents, None)
+            documents = documents if first is None else itertools.chain([first], documents)
+            return Response(stream_with_context(stream_documents(documents, close, ndjson)), mimetype=mimetype)
+
+        try:
+            page, key = store.page_sets(**filters, fields=fields, order=order, after=after, limit=limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        headers = {'X-Next-Cursor': encode_page_cursor(key)} if key else {}
+        if columnar:
+            frame = pd.DataFrame.from_records(page, columns=fields or None)
+            with span('json_serialize'):
+                body = json.dumps(frame_to_columnar(frame), separators=(',', ':'))
+            return Response(body, mimetype=COLUMNAR_MIMETYPE, headers=headers)
+        return Response(stream_with_context(stream_documents(page, lambda: None, ndjson)), mimetype=mimetype,
+                        headers=headers)
     except Exception as e:
         logger.error(f"Error getting workouts: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    try:
+        store.ping()
+        return jsonify({'status': 'ok', 'storage': store.name, 'pid': os.getpid()})
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        return jsonify({'status': 'error', 'storage': store.name, 'error': str(e), 'pid': os.getpid()}), 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint; each worker process reports its own counters."""
+    return Response(registry.render(), content_type=PROMETHEUS_MIMETYPE)
+
 @app.route('/api/exercises', methods=['GET'])
+@cached_response
 def get_exercises():
     try:
-        exercises = workouts_collection.distinct('exercise_title')
-        logger.info(f"Retrieved {len(exercises)} unique exercises")
+        exercises = store.exercises()
+        logger.debug(f"Retrieved {len(exercises)} unique exercises")
         return jsonify(exercises)
     except Exception as e:
         logger.error(f"Error getting exercises: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/exercises/<path:name>/prs', methods=['GET'])
+@cached_response
+def get_exercise_prs(name):
+    try:
+        try:
+            filters = filter_args(name)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        single_reps = request.args.get('single_reps', '').lower() in ('1', 'true')
+        sets = store.scan(**filters, columns=['start_time', 'weight_kg', 'reps'])
+        prs = weight_prs(sets, single_reps=single_reps)
+        logger.info(f"Computed {len(prs)} PRs for {name} from {len(sets)} sets")
+        return json_response(frame_to_records(prs))
+    except Exception as e:
+        logger.error(f"Error computing PRs: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/exercises/<path:name>/e1rm', methods=['GET'])
+@cached_response
+def get_exercise_e1rm(name):
+    try:
+        try:
+            filters = filter_args(name)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        sets = store.scan(**filters, columns=['start_time', 'weight_kg', 'reps'])
+        prs = e1rm_prs(sets)
+        logger.info(f"Computed {len(prs)} estimated 1RM PRs for {name} from {len(sets)} sets")
+        return json_response(frame_to_records(prs))
+    except Exception as e:
+        logger.error(f"Error computing estimated 1RMs: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/top-sets', methods=['GET'])
+@cached_response
+def get_top_sets():
+    try:
+        try:
+            filters = filter_args()
+            fields = fields_arg()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if 'fields' in request.args:
+            # The grouping keys and weight are always needed to pick the top set
+            sets = store.scan(**filters, columns=list(dict.fromkeys(['start_time', 'exercise_title', 'weight_kg'] + fields)))
+        else:
+            sets = store.scan(**filters)
+        result = top_sets(sets)
+        logger.info(f"Computed {len(result)} top sets from {len(sets)} sets")
+        return json_response(frame_to_records(result))
+    except Exception as e:
+        logger.error(f"Error computing top sets: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/series', methods=['GET'])
+@cached_response
+def get_series():
+    try:
+        x = request.args.get('x', 'start_time')
+        y = request.args.get('y', 'weight_kg')
+        try:
+            if x not in DATE_AXES and x not in NUMERIC_FIELDS:
+                raise ValueError(f"x must be one of {', '.join(sorted(DATE_AXES) + NUMERIC_FIELDS)}")
+            if y not in NUMERIC_FIELDS:
+                raise ValueError(f"y must be one of {', '.join(NUMERIC_FIELDS)}")
+            points = int(request.args.get('points', SERIES_DEFAULT_POINTS))
+            if not 2 <= points <= SERIES_MAX_POINTS:
+                raise ValueError(f'points must be between 2 and {SERIES_MAX_POINTS}')
+            filters = filter_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        top_sets_only = request.args.get('top_sets', '').lower() in ('1', 'true')
+        even = request.args.get('even_spacing', '').lower() in ('1', 'true')
+
+        sets = store.scan(**filters, columns=list(dict.fromkeys(['start_time', 'exercise_title', 'weight_kg', x, y])))
+        if top_sets_only:
+            sets = top_sets(sets)
+        with span('downsample'):
+            series = build_series(sets, x, y, points, even=even)
+        logger.info(f"Built {len(series['x'])}-point series from {series['total_points']} sets")
+        return json_response(series)
+    except Exception as e:
+        logger.error(f"Error building series: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rollups', methods=['GET'])
+@cached_response
+def get_rollups():
+    try:
+        period = request.args.get('period', 'week')
+        try:
+            if period not in PERIODS:
+                raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+            filters = filter_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        rollups = store.rollups(period, **filters)
+        logger.info(f"Retrieved {len(rollups)} {period} rollups")
+        return json_response(rollups)
+    except Exception as e:
+        logger.error(f"Error getting rollups: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rollups/rebuild', methods=['POST'])
+def rebuild_all_rollups():
+    """Recompute every stored rollup, e.g. for sets uploaded before rollups existed."""
+    try:
+        started = time.perf_counter()
+        # Uploads maintain rollups too, so a rebuild waits for them and holds them off until it is done
+        with store.ingest_lock(f'request-{uuid.uuid4().hex}'):
+            try:
+                count = store.rebuild_rollups()
+            finally:
+                bump_dataset_version()
+        seconds = round(time.perf_counter() - started, 3)
+        if count is None:
+            return jsonify({'message': f'The {store.name} store computes rollups on read', 'rollups': None,
+                            'seconds': seconds})
+        return jsonify({'message': f'Rebuilt {count} rollups', 'rollups': count, 'seconds': seconds})
+    except Exception as e:
+        logger.error(f"Error rebuilding rollups: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/upload', methods=['POST'])
 def upload_workouts():
     try:
@@ -104,38 +876,95 @@ def upload_workouts():
         if not file.filename.endswith('.csv'):
             return jsonify({'error': 'File must be a CSV'}), 400
 
-        # Read CSV file
-        df = pd.read_csv(file)
-        logger.info(f"Read {len(df)} rows from CSV file")
-        logger.info(f"CSV columns: {df.columns.tolist()}")
-
-        # Convert DataFrame to records
-        workouts = df.to_dict('records')
-        logger.info(f"Converted {len(workouts)} rows to workout records")
-
-        # Validate and clean workouts
-        valid_workouts = []
-        for workout in workouts:
-            is_valid, result = validate_workout(workout)
-            if is_valid:
-                valid_workouts.append(result)
+        mode = request.args.get('mode', request.form.get('mode', 'replace'))
+        if mode not in ('replace', 'stream', 'incremental'):
+            return jsonify({'error': f'Unknown upload mode: {mode}'}), 400
+        if request.args.get('async', request.form.get('async', '')).lower() in ('1', 'true'):
+            if mode == 'replace':
+                # Parses the whole file before clearing, like synchronous replace uploads
+                job = start_upload_job([file], mode, lambda paths, progress: replace_upload(
+                    paths[0], progress=progress))
             else:
-                logger.warning(f"Invalid workout data: {result}")
+                incremental = mode == 'incremental'
+                job = start_upload_job([file], mode, lambda paths, progress: stream_upload(
+                    paths[0], incremental=incremental, progress=progress))
+            return queued_response(job, mode)
 
-        if not valid_workouts:
-            return jsonify({'error': 'No valid workouts found in the file'}), 400
+        owner = f'request-{uuid.uuid4().hex}'
+        if mode == 'stream':
+            with store.ingest_lock(owner):
+                stats = stream_upload(file)
+            if not stats['inserted']:
+                return jsonify({'error': 'No valid workouts found in the file', **stats}), 400
+            return jsonify({'message': f"Successfully uploaded {stats['inserted']} workouts", **stats})
 
-        # Clear existing workouts and insert new ones
-        workouts_collection.delete_many({})
-        result = workouts_collection.insert_many(valid_workouts)
-        
-        logger.info(f"Successfully inserted {len(result.inserted_ids)} workouts")
-        return jsonify({'message': f'Successfully uploaded {len(result.inserted_ids)} workouts'})
+        if mode == 'incremental':
+            with store.ingest_lock(owner):
+                stats = stream_upload(file, incremental=True)
+            if not stats['inserted'] + stats['updated'] + stats['unchanged']:
+                return jsonify({'error': 'No valid workouts found in the file', **stats}), 400
+            return jsonify({'message': f"Synced workouts: {stats['inserted']} new, {stats['updated']} updated, "
+                                       f"{stats['unchanged']} unchanged", **stats})
+
+        with store.ingest_lock(owner):
+            stats = replace_upload(file)
+        if not stats['inserted']:
+            return jsonify({'error': 'No valid workouts found in the file'}), 400
+        return jsonify({'message': f"Successfully uploaded {stats['inserted']} workouts"})
 
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/upload/bulk', methods=['POST'])
+def bulk_upload_workouts():
+    """Import several exports at once: any mix of CSV files, zip archives of CSVs and gzipped CSVs."""
+    try:
+        files = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        unsupported = [file.filename for file in files if not is_supported(file.filename)]
+        if unsupported:
+            return jsonify({'error': f"Files must be {', '.join(SUPPORTED_EXTENSIONS)}: {', '.join(unsupported)}"}), 400
+
+        mode = request.args.get('mode', request.form.get('mode', 'replace'))
+        if mode not in ('replace', 'incremental'):
+            return jsonify({'error': f'Unknown bulk import mode: {mode}'}), 400
+        incremental = mode == 'incremental'
+        if request.args.get('async', request.form.get('async', '')).lower() in ('1', 'true'):
+            job = start_upload_job(files, mode, lambda paths, progress: bulk_import(
+                paths, incremental=incremental, progress=progress))
+            return queued_response(job, mode)
+
+        job_id = uuid.uuid4().hex
+        try:
+            paths = spool_files(job_id, files)
+            with store.ingest_lock(f'request-{job_id}'):
+                stats = bulk_import(paths, incremental=incremental)
+        finally:
+            shutil.rmtree(os.path.join(UPLOAD_SPOOL_DIR, job_id), ignore_errors=True)
+        if not stats['inserted'] + stats.get('updated', 0) + stats.get('unchanged', 0):
+            return jsonify({'error': 'No valid workouts found in the files', **stats}), 400
+        return jsonify({'message': f"Imported {stats['inserted']} workouts from {stats['files']} file(s), "
+                                   f"skipping {stats['duplicates']} duplicates", **stats})
+    except Exception as e:
+        logger.error(f"Error importing files: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/upload/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    try:
+        job = store.get_job(job_id)
+        if job is None:
+            return jsonify({'error': f'Unknown upload job: {job_id}'}), 404
+        job['job_id'] = job.pop('_id')
+        return json_response(job)
+    except Exception as e:
+        logger.error(f"Error getting upload job: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001, host='0.0.0.0') 
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Measure per-exercise query latency on a seeded collection with and without indexes.
+
+Seeds a scratch database (never the app's own) on MONGODB_URI.
+
+Usage: python backend/benchmarks/bench_indexes.py [rows]
+"""
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+from pymongo import MongoClient, ASCENDING
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from validation import validate_workouts_frame, frame_to_records  # noqa: E402
+from bench_validation import synthetic_workouts  # noqa: E402
+
+def time_queries(collection, exercises, repeats=5):
+    """Median latency in milliseconds of the queries the read endpoints issue."""
+    timings = {'find exercise': [], 'find exercise + 90 days': [], 'distinct': []}
+    latest = collection.find_one(sort=[('start_time', -1)])['start_time']
+    since = latest - timedelta(days=90)
+    for _ in range(repeats):
+        for exercise in exercises:
+            started = time.perf_counter()
+            list(collection.find({'exercise_title': exercise}, {'_id': 0}))
+            timings['find exercise'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            list(collection.find({'exercise_title': exercise, 'start_time': {'$gte': since}}, {'_id': 0})
+                 .sort('start_time', ASCENDING))
+            timings['find exercise + 90 days'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        collection.distinct('exercise_title')
+        timings['distinct'].append(time.perf_counter() - started)
+    return {name: statistics.median(values) * 1000 for name, values in timings.items()}
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    collection = client['workout_tracker_bench']['workouts']
+    collection.drop()
+
+    valid, _ = validate_workouts_frame(synthetic_workouts(rows))
+    records = frame_to_records(valid)
+    for start in range(0, len(records), 50_000):
+        collection.insert_many(records[start:start + 50_000], ordered=False)
+    exercises = collection.distinct('exercise_title')
+
+    before = time_queries(collection, exercises)
+    collection.create_index([('exercise_title', ASCENDING), ('start_time', ASCENDING)])
+    collection.create_index([('start_time', ASCENDING), ('_id', ASCENDING)])
+    after = time_queries(collection, exercises)
+
+    print(f"rows: {len(records)}, exercises: {len(exercises)}")
+    print(f"{'query':<26}{'no index (ms)':>15}{'indexed (ms)':>15}")
+    for name in before:
+        print(f"{name:<26}{before[name]:>15.1f}{after[name]:>15.1f}")
+    collection.drop()
+
+if __name__ == '__main__':
+    main()
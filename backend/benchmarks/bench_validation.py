@@ -0,0 +1,56 @@
+"""Compare per-row validate_workout with the column-wise validate_workouts_frame.
+
+Usage: python backend/benchmarks/bench_validation.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from validation import validate_workout, validate_workouts_frame, frame_to_records  # noqa: E402
+
+def synthetic_workouts(rows, seed=42):
+    """Build a Hevy-like DataFrame with NaNs and a sprinkling of invalid rows."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365 * 24 * 60, rows), unit='m')
+    exercises = np.array(['Bench Press (Barbell)', 'Squat (Barbell)', 'Deadlift (Barbell)', 'Pull Up', 'Running'])
+    df = pd.DataFrame({
+        'start_time': start.strftime('%d %b %Y, %H:%M'),
+        'exercise_title': exercises[rng.integers(0, len(exercises), rows)],
+        'weight_kg': rng.uniform(20, 200, rows).round(1),
+        'reps': rng.integers(1, 15, rows).astype(float),
+        'distance_km': np.nan,
+        'duration_seconds': np.nan,
+        'rpe': np.where(rng.random(rows) < 0.5, rng.integers(6, 11, rows), np.nan),
+    })
+    df.loc[rng.random(rows) < 0.01, 'exercise_title'] = np.nan
+    return df
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = synthetic_workouts(rows)
+
+    started = time.perf_counter()
+    per_row = [validate_workout(record) for record in df.to_dict('records')]
+    per_row_valid = sum(1 for is_valid, _ in per_row if is_valid)
+    per_row_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    valid, _ = validate_workouts_frame(df)
+    validate_seconds = time.perf_counter() - started
+    frame_to_records(valid)
+    frame_seconds = time.perf_counter() - started
+
+    assert per_row_valid == len(valid), (per_row_valid, len(valid))
+    print(f"rows: {rows}, valid: {len(valid)}")
+    print(f"to_dict + validate_workout (per row):         {per_row_seconds:8.3f}s")
+    print(f"validate_workouts_frame (vector):             {validate_seconds:8.3f}s")
+    print(f"validate_workouts_frame + frame_to_records:   {frame_seconds:8.3f}s")
+    print(f"speedup (validation only): {per_row_seconds / validate_seconds:.1f}x")
+    print(f"speedup (including record conversion): {per_row_seconds / frame_seconds:.1f}x")
+
+if __name__ == '__main__':
+    main()
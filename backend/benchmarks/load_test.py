@@ -0,0 +1,62 @@
+"""Concurrent load test for the read endpoints.
+
+Reports throughput and p50/p99 latency per endpoint against a running server.
+
+Usage: python backend/benchmarks/load_test.py [--url http://localhost:5001] [--concurrency 16] [--requests 500]
+"""
+import argparse
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = ['/api/workouts', '/api/exercises']
+
+def fetch(url):
+    """Time one GET request, returning (seconds, status)."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            status = response.status
+    except Exception:
+        status = None
+    return time.perf_counter() - started, status
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run(url, concurrency, requests):
+    """Fire requests at url from concurrency threads and summarize the latencies."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, [url] * requests))
+    elapsed = time.perf_counter() - started
+    latencies = [seconds for seconds, status in results if status == 200]
+    return {
+        'ok': len(latencies),
+        'errors': requests - len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--endpoint', action='append', help='endpoint path to test (repeatable)')
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<20}{'ok':>6}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for endpoint in args.endpoint or ENDPOINTS:
+        stats = run(args.url.rstrip('/') + endpoint, args.concurrency, args.requests)
+        p50 = f"{stats['p50_ms']:.1f}" if stats['p50_ms'] is not None else '-'
+        p99 = f"{stats['p99_ms']:.1f}" if stats['p99_ms'] is not None else '-'
+        print(f"{endpoint:<20}{stats['ok']:>6}{stats['errors']:>8}{stats['throughput']:>10.1f}{p50:>10}{p99:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Parallel parsing and validation of several Hevy exports for bulk imports.
+
+Inputs are CSV files, zip archives of CSVs and gzipped CSVs. Every CSV becomes one or more
+parts (large plain CSVs are split into byte ranges at row boundaries) that a process pool
+parses and validates. Results come back in input order, so sets repeated across files can
+be dropped in favour of the first file that has them. app.bulk_import writes the results.
+
+Usage: python bulk_import.py [--mode replace|incremental] [--workers N] export.csv more.zip ...
+"""
+import argparse
+import collections
+import gzip
+import io
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from validation import validate_workouts_frame, set_key_bases
+
+SUPPORTED_EXTENSIONS = ('.csv', '.zip', '.gz')
+# Bytes read at a time while looking for the row boundaries of byte ranges
+SCAN_BLOCK_BYTES = 8 * 1024 * 1024
+
+def is_supported(filename):
+    return filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+def byte_ranges(path, target_bytes):
+    """Split a CSV file's rows into byte ranges of about target_bytes, each ending at a row boundary.
+
+    Newlines inside quoted fields (e.g. multi-line notes) are not row boundaries, so the quote
+    parity is tracked from the start of the file. Returns the header line and (start, end) offsets.
+    """
+    ranges = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = position = f.tell()
+        next_split = start + target_bytes
+        in_quotes = False
+        while True:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            # in_quotes is the parity up to this offset of the block
+            scanned = 0
+            while position + len(block) > next_split:
+                newline = block.find(b'\n', max(next_split - position, scanned))
+                if newline < 0:
+                    break
+                in_quotes ^= block.count(b'"', scanned, newline) % 2 == 1
+                scanned = newline
+                if in_quotes:
+                    next_split = position + newline + 1
+                    continue
+                ranges.append((start, position + newline + 1))
+                start = position + newline + 1
+                next_split = start + target_bytes
+            in_quotes ^= block.count(b'"', scanned) % 2 == 1
+            position += len(block)
+    if position > start:
+        ranges.append((start, position))
+    return header, ranges
+
+def plan_parts(paths, split_bytes):
+    """Parts to parse, in input order. Each part is a dict naming its file and how to read it."""
+    parts = []
+    for file_index, path in enumerate(paths):
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                members = sorted(name for name in archive.namelist()
+                                 if name.lower().endswith('.csv') and not name.startswith('__MACOSX/'))
+            if not members:
+                raise ValueError(f'No CSV files in {os.path.basename(path)}')
+            # Each member is a separate export, deduplicated against the others like separate files
+            parts.extend({'file': f'{file_index}:{member}', 'path': path, 'member': member} for member in members)
+        elif lower.endswith('.gz'):
+            parts.append({'file': str(file_index), 'path': path, 'compression': 'gzip'})
+        elif lower.endswith('.csv'):
+            header = pd.read_csv(path, nrows=0).columns
+            # Without set_index, set keys number the sets of a workout, so a workout must not be split
+            if os.path.getsize(path) <= split_bytes or 'set_index' not in header:
+                parts.append({'file': str(file_index), 'path': path})
+                continue
+            header, ranges = byte_ranges(path, split_bytes)
+            parts.extend({'file': str(file_index), 'path': path, 'header': header, 'start': start, 'end': end}
+                         for start, end in ranges)
+        else:
+            raise ValueError(f'Unsupported file type: {os.path.basename(path)}')
+    return parts
+
+def read_part(part):
+    if 'member' in part:
+        with zipfile.ZipFile(part['path']) as archive, archive.open(part['member']) as f:
+            return pd.read_csv(f)
+    if part.get('compression') == 'gzip':
+        with gzip.open(part['path'], 'rb') as f:
+            return pd.read_csv(f)
+    if 'start' in part:
+        with open(part['path'], 'rb') as f:
+            f.seek(part['start'])
+            data = f.read(part['end'] - part['start'])
+        return pd.read_csv(io.BytesIO(part['header'] + data))
+    return pd.read_csv(part['path'])
+
+def parse_part(part):
+    """Parse and validate one part in a worker process; rejections come back as counts per reason.
+
+    The hashing half of the set_keys is done here too; occurrences need the parts in order.
+    """
+    started = time.perf_counter()
+    df = read_part(part)
+    parsed = time.perf_counter()
+    valid, reasons = validate_workouts_frame(df)
+    rejections = pd.Series(reasons).dropna().value_counts()
+    return {
+        'file': part['file'],
+        'rows': len(df),
+        'valid': valid,
+        'bases': set_key_bases(valid),
+        'rejections': {reason: int(count) for reason, count in rejections.items()},
+        'parse_seconds': parsed - started,
+        'validate_seconds': time.perf_counter() - parsed,
+    }
+
+def parse_parallel(parts, workers):
+    """Yield parse_part results in input order, keeping at most two parts per worker in flight."""
+    if workers <= 1:
+        for part in parts:
+            yield parse_part(part)
+        return
+    # Spawned workers do not inherit the server's threads, locks or database connections
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        parts = iter(parts)
+        pending = collections.deque(pool.submit(parse_part, part) for part in itertools.islice(parts, workers * 2))
+        while pending:
+            result = pending.popleft().result()
+            part = next(parts, None)
+            if part is not None:
+                pending.append(pool.submit(parse_part, part))
+            yield result
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+class CrossFileDuplicates:
+    """Drops sets whose set_key already came from an earlier file.
+
+    set_keys are unique within a file, so this only compares against earlier files.
+    Results must arrive in file order.
+    """
+
+    def __init__(self):
+        self.earlier = np.empty(0, dtype=np.uint64)
+        self.current = []
+        self.file = None
+
+    def filter(self, df, file):
+        """df without the sets seen in earlier files, and how many were dropped."""
+        if file != self.file:
+            if self.current:
+                self.earlier = np.union1d(self.earlier, np.concatenate(self.current))
+            self.current = []
+            self.file = file
+        if df.empty:
+            return df, 0
+        hashes = df['set_key'].to_numpy().view(np.uint64)
+        self.current.append(hashes)
+        if not len(self.earlier):
+            return df, 0
+        positions = np.searchsorted(self.earlier, hashes).clip(max=len(self.earlier) - 1)
+        repeated = self.earlier[positions] == hashes
+        return df[~repeated], int(repeated.sum())
+
+def main():
+    parser = argparse.ArgumentParser(description='Import several Hevy exports (CSV, zip or gzip) in parallel.')
+    parser.add_argument('paths', nargs='+', help='CSV files, zip archives of CSVs or gzipped CSVs')
+    parser.add_argument('--mode', choices=('replace', 'incremental'), default='replace',
+                        help='replace all stored sets, or upsert by set_key (default: replace)')
+    parser.add_argument('--workers', type=int, help='parser processes (default: BULK_IMPORT_WORKERS)')
+    args = parser.parse_args()
+    if args.workers:
+        os.environ['BULK_IMPORT_WORKERS'] = str(args.workers)
+
+    import app
+    with app.store.ingest_lock(f'cli-{uuid.uuid4().hex}'):
+        stats = app.bulk_import(args.paths, incremental=args.mode == 'incremental')
+
+    print(f"Imported {stats['files']} file(s) as {stats['parts']} part(s) with {stats['workers']} worker(s) "
+          f"in {stats['seconds']:.2f}s ({stats['rows_per_second']} rows/s)")
+    for name in ('rows_read', 'inserted', 'updated', 'unchanged', 'duplicates', 'rejected'):
+        if name in stats:
+            print(f'  {name:<12}{stats[name]:>12}')
+    # Parsing and validation run in the workers, so their times add up across processes
+    print(f"\n  {'stage':<12}{'seconds':>12}")
+    for stage, seconds in stats['stages'].items():
+        print(f'  {stage:<12}{seconds:>12.3f}')
+    if not stats['inserted'] + stats.get('updated', 0) + stats.get('unchanged', 0):
+        sys.exit('No valid workouts found in the files')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized response bodies.
+
+    Entries are bounded both by count and by total body size. Bodies above
+    gzip_min_bytes are stored pre-compressed alongside the plain body.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, gzip_min_bytes=1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.gzip_min_bytes = gzip_min_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached entry for key, marking it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, mimetype):
+        """Store a response body, evicting least recently used entries as needed."""
+        compressed = gzip.compress(body, compresslevel=6) if self.gzip_min_bytes and len(body) >= self.gzip_min_bytes else None
+        entry = {'body': body, 'gzip': compressed, 'mimetype': mimetype}
+        size = len(body) + len(compressed or b'')
+        if size > self.max_bytes:
+            return None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous['size']
+            entry['size'] = size
+            self._entries[key] = entry
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted['size']
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
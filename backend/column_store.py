@@ -0,0 +1,480 @@
+"""Embedded columnar store: sets partitioned by exercise into memory-mapped column files.
+
+Layout under the store's root directory:
+
+    manifest.json                 {"partitions": {exercise_title: [segment, ...]}}
+    segments/<segment>/meta.json  row count, start_time range and the encoding of each column
+    segments/<segment>/<n>.npy    one array per column, rows sorted by start_time
+    version                       dataset version
+    jobs/<job_id>.json            upload job documents
+
+Segments are immutable. Writers add or replace segments and then swap the manifest
+atomically, so readers never see a partial upload. Reads prune partitions by exercise,
+skip segments whose start_time range misses the requested dates, binary-search the
+sorted start_time column for the rows in range, and only open the columns asked for.
+Rollups are not stored; they are aggregated from the sets when requested.
+"""
+import contextlib
+import fcntl
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage import Store, ROLLUP_SOURCE_COLUMNS, changed_rows
+from validation import frame_to_records, SetKeys
+from rollups import rollup_frame
+from metrics import span
+
+class ColumnStore(Store):
+    """Sets in local column files, one partition of sorted segments per exercise."""
+
+    name = 'column'
+    read_span = 'column_scan'
+
+    def __init__(self, root, max_segments=8, batch_size=2000, job_ttl=7 * 24 * 3600):
+        self.root = root
+        self.segments_dir = os.path.join(root, 'segments')
+        self.jobs_dir = os.path.join(root, 'jobs')
+        # Appends add one segment per exercise; past this many a partition is merged back into one
+        self.max_segments = max_segments
+        self.batch_size = batch_size
+        self.job_ttl = job_ttl
+        self._jobs_lock = threading.Lock()
+        os.makedirs(self.segments_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def ping(self):
+        if not os.access(self.root, os.W_OK):
+            raise OSError(f'Column store directory is not writable: {self.root}')
+
+    def drop(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    # Manifest and segments
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.root, 'manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'partitions': {}}
+
+    def write_manifest(self, manifest):
+        path = os.path.join(self.root, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def write_segment(self, df):
+        """Write df as a new segment sorted by start_time, returning its name."""
+        df = df.sort_values('start_time', kind='stable')
+        name = uuid.uuid4().hex
+        staging = os.path.join(self.segments_dir, f'.{name}.tmp')
+        os.makedirs(staging)
+        columns = {}
+        for i, column in enumerate(df.columns):
+            values, spec = encode_values(df[column])
+            spec['file'] = f'{i}.npy'
+            np.save(os.path.join(staging, spec['file']), values)
+            columns[column] = spec
+        times = df['start_time'].dropna()
+        meta = {
+            'rows': len(df),
+            'start_min': int(times.iloc[0].value) if len(times) else None,
+            'start_max': int(times.iloc[-1].value) if len(times) else None,
+            'columns': columns,
+        }
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.rename(staging, os.path.join(self.segments_dir, name))
+        return name
+
+    def remove_segments(self, segments):
+        for segment in segments:
+            shutil.rmtree(os.path.join(self.segments_dir, segment), ignore_errors=True)
+
+    def read_segment(self, segment, columns, date_from, date_to, position=None):
+        """Rows of one segment within the date range, restricted to columns; None when none match.
+
+        position is the segment's index in its partition. When given, a position column numbers
+        the rows in stored order across the partition.
+        """
+        directory = os.path.join(self.segments_dir, segment)
+        meta = read_meta(directory)
+        low, high = to_nanoseconds(date_from), to_nanoseconds(date_to)
+        # Zone map: skip segments entirely outside the range without opening any column
+        if low is not None and (meta['start_max'] is None or meta['start_max'] < low):
+            return None
+        if high is not None and (meta['start_min'] is None or meta['start_min'] > high):
+            return None
+        start, stop = 0, meta['rows']
+        if low is not None or high is not None:
+            times = np.load(os.path.join(directory, meta['columns']['start_time']['file']), mmap_mode='r')
+            if low is not None:
+                start = int(np.searchsorted(times, np.datetime64(low, 'ns'), side='left'))
+            if high is not None:
+                stop = int(np.searchsorted(times, np.datetime64(high, 'ns'), side='right'))
+        if start >= stop:
+            return None
+        data = {}
+        for column in columns:
+            spec = meta['columns'].get(column)
+            if spec is None:
+                continue
+            # Memory-mapped, so only the pages of the selected rows are read from disk
+            values = np.load(os.path.join(directory, spec['file']), mmap_mode='r')[start:stop]
+            data[column] = decode_values(values, spec)
+        if position is not None:
+            data['position'] = (position << 32) + np.arange(start, stop, dtype=np.int64)
+        return pd.DataFrame(data)
+
+    def read_partitions(self, exercise, date_from, date_to, columns, with_position=False):
+        """Concatenated matching rows of every selected partition."""
+        # A concurrent compaction may delete segments listed in the manifest just read; retry once
+        for attempt in range(2):
+            try:
+                return self._read_partitions(exercise, date_from, date_to, columns, with_position)
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+    def _read_partitions(self, exercise, date_from, date_to, columns, with_position):
+        partitions = self.manifest()['partitions']
+        names = [exercise] if exercise is not None else sorted(partitions)
+        segments = [(segment, i) for name in names for i, segment in enumerate(partitions.get(name, []))]
+        return self.read_segments([segment for segment, _ in segments], date_from, date_to, columns,
+                                  positions=[i for _, i in segments] if with_position else None)
+
+    def read_segments(self, segments, date_from=None, date_to=None, columns=None, with_key=False, positions=None):
+        """Concatenated matching rows of segments; set_key is only included when with_key is set.
+
+        positions, the index of each segment in its partition, adds read_segment's position column.
+        """
+        if columns is None:
+            # Every stored column, in the order of the first segment that has it
+            columns = list(dict.fromkeys(column for segment in segments
+                                         for column in read_meta(os.path.join(self.segments_dir, segment))['columns']))
+            if 'set_key' in columns:
+                columns.remove('set_key')
+        if with_key and 'set_key' not in columns:
+            columns = list(columns) + ['set_key']
+        with span('column_scan'):
+            frames = [frame for frame in (self.read_segment(segment, columns, date_from, date_to,
+                                                            positions[i] if positions is not None else None)
+                                          for i, segment in enumerate(segments)) if frame is not None]
+            if not frames:
+                return pd.DataFrame(columns=columns + ['position'] if positions is not None else columns)
+            if len(frames) == 1:
+                return frames[0]
+            return pd.concat(frames, ignore_index=True)
+
+    # Sets
+
+    def clear(self):
+        with span('column_write'):
+            partitions = self.manifest()['partitions']
+            self.write_manifest({'partitions': {}})
+            self.remove_segments(segment for segments in partitions.values() for segment in segments)
+
+    def add_segment(self, manifest, exercise, df, obsolete):
+        """Append df to the exercise's partition as a new segment, merging the partition once it has too many."""
+        segments = manifest['partitions'].setdefault(exercise, [])
+        segments.append(self.write_segment(df))
+        if len(segments) > self.max_segments:
+            merged = self.read_segments(segments, with_key=True)
+            obsolete.extend(segments)
+            manifest['partitions'][exercise] = [self.write_segment(merged)]
+
+    def insert_sets(self, df):
+        if df.empty:
+            return 0
+        with span('column_write'):
+            manifest = self.manifest()
+            obsolete = []
+            for exercise, part in df.groupby('exercise_title', sort=False):
+                self.add_segment(manifest, exercise, part, obsolete)
+            self.write_manifest(manifest)
+            self.remove_segments(obsolete)
+        return len(df)
+
+    def upsert_sets(self, df):
+        if df.empty:
+            return 0, 0, 0
+        inserted = updated = unchanged = 0
+        with span('column_write'):
+            manifest = self.manifest()
+            obsolete = []
+            for exercise, part in df.groupby('exercise_title', sort=False):
+                segments = manifest['partitions'].get(exercise, [])
+                values = part.drop(columns='set_key')
+                # Only the uploaded columns are compared; position tells which segment holds a stored set
+                existing = self.read_segments(segments, columns=list(values.columns), with_key=True,
+                                              positions=list(range(len(segments))))
+                keys = part['set_key'].to_numpy()
+                # Like an upsert, each key replaces the first stored set with that key
+                replaced = (np.isin(existing['set_key'].to_numpy(), keys)
+                            & ~existing['set_key'].duplicated().to_numpy())
+                stored = existing[replaced].reset_index(drop=True)
+                # Row of stored holding each uploaded key, -1 for new keys
+                match = pd.Index(stored['set_key']).get_indexer(keys)
+                # Rows are upserted in order, so a repeated key is compared with its previous row in the batch
+                first = ~part['set_key'].duplicated().to_numpy()
+                previous = part.groupby('set_key', sort=False)[list(values.columns)].shift(1)
+                # Missing labels (-1) reindex to empty rows, so new keys compare against nothing
+                from_store = stored.reindex(index=match[first], columns=values.columns).set_axis(part.index[first])
+                for column in values.columns:
+                    previous[column] = previous[column].mask(first, from_store[column])
+                matched = ~first | (match >= 0)
+                changed = changed_rows(values, previous)
+                inserted += int((~matched).sum())
+                updated += int((matched & changed).sum())
+                unchanged += int((matched & ~changed).sum())
+
+                # Keys with a new or changed row are written once, as their last row; other sets stay where they are
+                written = pd.Series(~matched | changed).groupby(keys, sort=False).transform('any').to_numpy()
+                last = written & ~part['set_key'].duplicated(keep='last').to_numpy()
+                if not last.any():
+                    continue
+                new = part[last].reset_index(drop=True)
+                rows = match[last]
+                replaced_at = np.full(len(new), -1, dtype=np.int64)
+                replaced_at[rows >= 0] = stored['position'].to_numpy()[rows[rows >= 0]]
+                # Only the segments holding a replaced set are rewritten; new sets alone just add a segment
+                touched = sorted(set((replaced_at[rows >= 0] >> 32).tolist()))
+                rewritten = self.read_segments([segments[i] for i in touched], with_key=True, positions=touched)
+                old = rewritten.reindex(pd.Index(rewritten['position']).get_indexer(replaced_at)).reset_index(drop=True)
+                # Stored columns missing from the upload keep their values, as with $set
+                for column in old.columns.difference(new.columns).drop('position'):
+                    new[column] = old[column]
+                kept = rewritten[~rewritten['position'].isin(replaced_at)].drop(columns='position')
+                obsolete.extend(segments[i] for i in touched)
+                manifest['partitions'][exercise] = [segment for i, segment in enumerate(segments) if i not in touched]
+                self.add_segment(manifest, exercise, pd.concat([kept, new], ignore_index=True) if len(kept) else new,
+                                 obsolete)
+            self.write_manifest(manifest)
+            self.remove_segments(obsolete)
+        return inserted, updated, unchanged
+
+    def ensure_set_keys(self):
+        manifest = self.manifest()
+        # Replace uploads store no set_key, and keys from before occurrences were added are strings
+        stale = [exercise for exercise, segments in manifest['partitions'].items()
+                 if any(read_meta(os.path.join(self.segments_dir, segment))['columns'].get('set_key', {}).get('kind')
+                        != 'number' for segment in segments)]
+        if not stale:
+            return 0
+        keys = SetKeys()
+        keyed = 0
+        obsolete = []
+        with span('column_write'):
+            for exercise in stale:
+                # Rows keep their upload order within a start_time, so occurrences match the export's
+                sets = self.read_segments(manifest['partitions'][exercise])
+                sets['set_key'] = keys.assign(sets)
+                keyed += len(sets)
+                obsolete.extend(manifest['partitions'][exercise])
+                manifest['partitions'][exercise] = [self.write_segment(sets)]
+            self.write_manifest(manifest)
+            self.remove_segments(obsolete)
+        return keyed
+
+    def exercises(self):
+        return sorted(name for name, segments in self.manifest()['partitions'].items() if segments)
+
+    def scan(self, exercise=None, date_from=None, date_to=None, columns=None):
+        frame = self.read_partitions(exercise, date_from, date_to, columns)
+        # Like a MongoDB projection loaded with explicit columns, missing columns come back empty
+        return frame.reindex(columns=columns) if columns else frame
+
+    def sorted_sets(self, exercise, date_from, date_to, fields, order):
+        """Matching sets sorted by start_time, exercise_title and stored position, which is unique per exercise.
+
+        Callers drop the position column, and exercise_title when it was not asked for.
+        """
+        columns = list(dict.fromkeys(fields + ['start_time', 'exercise_title'])) if fields else None
+        frame = self.read_partitions(exercise, date_from, date_to, columns, with_position=True)
+        return frame.sort_values(['start_time', 'exercise_title', 'position'], ascending=order == 'asc',
+                                 kind='stable', ignore_index=True)
+
+    def iter_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order=None):
+        if order:
+            frame = self.sorted_sets(exercise, date_from, date_to, fields, order).drop(columns='position')
+        else:
+            frame = self.read_partitions(exercise, date_from, date_to, fields or None)
+        frame = frame[[column for column in frame.columns if column in fields]] if fields else \
+            frame.drop(columns='set_key', errors='ignore')
+
+        def documents():
+            for start in range(0, len(frame), self.batch_size):
+                yield from frame_to_records(frame.iloc[start:start + self.batch_size])
+        iterator = documents()
+        return iterator, iterator.close
+
+    def page_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order='asc', after=None, limit=100):
+        frame = self.sorted_sets(exercise, date_from, date_to, fields, order)
+        if after:
+            start_time, last_key = after
+            try:
+                position, exercise_title = last_key.split(':', 1)
+                position = int(position)
+            except (AttributeError, ValueError):
+                raise ValueError('Invalid cursor')
+            start_time = pd.Timestamp(start_time) if start_time is not None else pd.NaT
+            times, titles, positions = frame['start_time'], frame['exercise_title'], frame['position']
+            if order == 'asc':
+                later = (times > start_time) | ((times == start_time) & (
+                    (titles > exercise_title) | ((titles == exercise_title) & (positions > position))))
+            else:
+                later = (times < start_time) | ((times == start_time) & (
+                    (titles < exercise_title) | ((titles == exercise_title) & (positions < position))))
+            frame = frame[later]
+        page = frame.head(limit + 1)
+        key = None
+        if len(page) > limit:
+            page = page.head(limit)
+            last = page.iloc[-1]
+            key = (last['start_time'].to_pydatetime() if pd.notna(last['start_time']) else None,
+                   f"{last['position']}:{last['exercise_title']}")
+        page = page[[column for column in page.columns if column in fields]] if fields else \
+            page.drop(columns=['set_key', 'position'], errors='ignore')
+        return frame_to_records(page), key
+
+    # Rollups
+
+    def rollups(self, period, exercise=None, date_from=None, date_to=None):
+        # A period that starts by date_to can contain sets up to a week later
+        scan_to = date_to + timedelta(days=7) if date_to else None
+        sets = self.scan(exercise, date_from, scan_to, ROLLUP_SOURCE_COLUMNS)
+        with span('rollups'):
+            frame = rollup_frame(sets, period)
+            if date_from:
+                frame = frame[frame['period_start'] >= pd.Timestamp(date_from)]
+            if date_to:
+                frame = frame[frame['period_start'] <= pd.Timestamp(date_to)]
+            return frame_to_records(frame)
+
+    def rebuild_rollups(self):
+        return None
+
+    # Metadata
+
+    @contextlib.contextmanager
+    def file_lock(self, name):
+        """Exclusive flock on a file under the root; blocks other threads and processes alike."""
+        with open(os.path.join(self.root, name), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def dataset_version(self):
+        try:
+            with open(os.path.join(self.root, 'version')) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump_dataset_version(self):
+        with self.file_lock('version.lock'):
+            version = self.dataset_version() + 1
+            path = os.path.join(self.root, 'version')
+            with open(path + '.tmp', 'w') as f:
+                f.write(str(version))
+            os.replace(path + '.tmp', path)
+        return version
+
+    def ingest_lock(self, owner):
+        # The kernel drops the lock if the holding process dies, so no lease is needed
+        return self.file_lock('ingest.lock')
+
+    # Upload jobs
+
+    def job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def write_job(self, job):
+        path = self.job_path(job['_id'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(job, f, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+        os.replace(path + '.tmp', path)
+
+    def create_job(self, job):
+        # Finished upload jobs are only kept around for status polling
+        expired = time.time() - self.job_ttl
+        for entry in os.scandir(self.jobs_dir):
+            with contextlib.suppress(FileNotFoundError):
+                if entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+        with self._jobs_lock:
+            self.write_job(dict(job))
+
+    def update_job(self, job_id, **fields):
+        with self._jobs_lock:
+            job = self.get_job(job_id)
+            if job is not None:
+                self.write_job({**job, **fields})
+
+    def get_job(self, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self.job_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+@functools.lru_cache(maxsize=4096)
+def read_meta(directory):
+    """Segment metadata; segments never change once written, so it is cached by path."""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        return json.load(f)
+
+def to_nanoseconds(value):
+    """Epoch nanoseconds of a naive-UTC or aware datetime, None for None."""
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return timestamp.value
+
+# Python types a dictionary can hold; JSON stores each of them without loss
+DICTIONARY_TYPES = (str, bool, int, float)
+
+def encode_values(series):
+    """Array to store for a column, plus its encoding: datetimes, numbers or dictionary-encoded values.
+
+    Dictionaries are stored as JSON lists, so only strings, booleans and numbers can be
+    dictionary-encoded; any other value raises TypeError rather than being stored altered.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_convert(None)
+        return series.to_numpy(dtype='datetime64[ns]'), {'kind': 'datetime'}
+    if series.dtype.kind in 'biu' and not series.hasnans:
+        return series.to_numpy(dtype=getattr(series.dtype, 'numpy_dtype', series.dtype)), {'kind': 'number'}
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan), {'kind': 'number'}
+    # Missing values get code -1, which decodes to the None appended to the dictionary
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    dictionary = [value.item() if isinstance(value, np.generic) else value for value in uniques]
+    for value in dictionary:
+        if not isinstance(value, DICTIONARY_TYPES):
+            raise TypeError(f'Cannot store {type(value).__name__} values of column {series.name!r}')
+    return codes.astype(np.int32), {'kind': 'dictionary', 'dictionary': dictionary}
+
+def decode_values(values, spec):
+    if spec['kind'] == 'dictionary':
+        dictionary = np.empty(len(spec['dictionary']) + 1, dtype=object)
+        dictionary[:-1] = spec['dictionary']
+        return dictionary[values]
+    return np.array(values)
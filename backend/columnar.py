@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+COLUMNAR_MIMETYPE = 'application/vnd.hevy.columnar+json'
+
+# Columns sent as a dictionary of distinct values plus one integer index per row
+DICTIONARY_COLUMNS = {'exercise_title', 'title'}
+
+def encode_column(column):
+    """Encode a Series as a JSON-ready list, or a dictionary encoding for repetitive strings."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        # Epoch milliseconds, null for missing dates
+        millis = (column - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+        return millis.astype(object).where(column.notna(), None).tolist()
+    if column.name in DICTIONARY_COLUMNS:
+        indices, dictionary = pd.factorize(column, use_na_sentinel=True)
+        return {'dictionary': dictionary.tolist(), 'indices': np.where(indices < 0, None, indices).tolist()}
+    return column.astype(object).where(column.notna(), None).tolist()
+
+def frame_to_columnar(df):
+    """Column-oriented payload: one array per column instead of one object per set."""
+    return {
+        'length': len(df),
+        'columns': {name: encode_column(df[name]) for name in df.columns},
+    }
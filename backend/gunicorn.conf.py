@@ -0,0 +1,23 @@
+"""Gunicorn settings for serving the API in production.
+
+Usage: gunicorn --config gunicorn.conf.py app:app (from the backend directory)
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+# Threads let a worker overlap requests that wait on MongoDB
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    # A preloaded app opened its store (and MongoClient) in the master; give each worker its own
+    if preload_app:
+        import app
+        app.connect_store()
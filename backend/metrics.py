@@ -0,0 +1,173 @@
+import contextlib
+import os
+import threading
+import time
+
+# Prometheus' default latency buckets, extended for multi-second uploads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Monotonic counter, one value per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, format_labels(self.labels, key), value
+
+class Histogram:
+    """Cumulative histogram of observed values (usually seconds), per combination of label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, {**value, 'counts': list(value['counts'])}) for key, value in self._series.items())
+        for key, value in series:
+            for bound, count in zip(self.buckets, value['counts']):
+                yield f'{self.name}_bucket', format_labels(self.labels + ('le',), key + (format_value(bound),)), count
+            yield f'{self.name}_bucket', format_labels(self.labels + ('le',), key + ('+Inf',)), value['count']
+            yield f'{self.name}_sum', format_labels(self.labels, key), value['sum']
+            yield f'{self.name}_count', format_labels(self.labels, key), value['count']
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+REQUEST_SECONDS = registry.register(Histogram(
+    'hevy_http_request_duration_seconds', 'Time spent handling requests, until the response body starts streaming.',
+    labels=('method', 'endpoint', 'status')))
+SPAN_SECONDS = registry.register(Histogram(
+    'hevy_span_duration_seconds', 'Time spent in named hot-path phases of a request.', labels=('span',)))
+UPLOAD_ROWS = registry.register(Counter(
+    'hevy_upload_rows_total', 'CSV rows processed by uploads, by outcome.', labels=('outcome',)))
+UPLOAD_REJECTIONS = registry.register(Counter(
+    'hevy_upload_rejections_total', 'CSV rows rejected by validation, by reason.', labels=('reason',)))
+RESPONSE_CACHE = registry.register(Counter(
+    'hevy_response_cache_requests_total', 'Read requests by response cache result.', labels=('result',)))
+
+def span(name):
+    """Time a block as the named span, e.g. `with span('csv_parse'): ...`."""
+    return SPAN_SECONDS.time(span=name)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable (e.g. macOS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+class RssSampler:
+    """Samples the process RSS in a background thread while a block runs.
+
+    Unlike getrusage's ru_maxrss, which is the high-water mark of the whole process
+    lifetime, peak_mb only covers the block, e.g. one upload. It is None where RSS
+    cannot be read. Other requests served meanwhile by the same process count too.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self.run, name='rss-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+
+    @property
+    def peak_mb(self):
+        return None if self.peak is None else round(self.peak / 1024 / 1024, 1)
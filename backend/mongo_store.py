@@ -0,0 +1,320 @@
+import contextlib
+import itertools
+import threading
+import time
+from datetime import timedelta
+import logging
+
+import pandas as pd
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from storage import Store, ROLLUP_SOURCE_COLUMNS, changed_rows, utcnow
+from validation import frame_to_records, SetKeys
+from rollups import rollup_frame, period_starts, PERIODS, SUM_FIELDS, MAX_FIELDS
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+class MongoStore(Store):
+    """Sets, rollups, upload jobs and metadata in one MongoDB database."""
+
+    name = 'mongo'
+    read_span = 'mongo_find'
+
+    def __init__(self, uri, database, batch_size=2000, job_ttl=7 * 24 * 3600, lock_lease=60, lock_poll=0.5,
+                 **client_options):
+        self.client = MongoClient(uri, **client_options)
+        self.database = database
+        self.db = self.client[database]
+        self.workouts = self.db['workouts']
+        self.metadata = self.db['metadata']
+        self.rollups_collection = self.db['rollups']
+        self.jobs = self.db['upload_jobs']
+        self.batch_size = batch_size
+        self.job_ttl = job_ttl
+        self.lock_lease = lock_lease
+        self.lock_poll = lock_poll
+
+    def ensure_indexes(self):
+        """Create the indexes the read endpoints rely on (no-op when they already exist)."""
+        try:
+            # Serves exercise filters, distinct('exercise_title') and per-exercise date ranges/sorts
+            self.workouts.create_index([('exercise_title', ASCENDING), ('start_time', ASCENDING)])
+            # Serves date ranges and keyset pagination across all exercises
+            self.workouts.create_index([('start_time', ASCENDING), ('_id', ASCENDING)])
+            # Serves the upserts of incremental uploads
+            self.workouts.create_index([('set_key', ASCENDING)])
+            # One rollup per period, exercise and period start; also serves per-exercise date ranges
+            self.rollups_collection.create_index(
+                [('period', ASCENDING), ('exercise_title', ASCENDING), ('period_start', ASCENDING)], unique=True)
+            # Finished upload jobs are only kept around for status polling
+            self.jobs.create_index([('created_at', ASCENDING)], expireAfterSeconds=self.job_ttl)
+        except Exception as e:
+            logger.warning(f"Could not ensure indexes: {str(e)}")
+
+    def ping(self):
+        self.client.admin.command('ping')
+
+    def drop(self):
+        self.client.drop_database(self.database)
+
+    @staticmethod
+    def query(exercise=None, date_from=None, date_to=None, date_field='start_time'):
+        """MongoDB query for an exercise and an inclusive date range."""
+        conditions = [] if exercise is None else [{'exercise_title': exercise}]
+        date_range = {}
+        if date_from:
+            date_range['$gte'] = date_from
+        if date_to:
+            date_range['$lte'] = date_to
+        if date_range:
+            conditions.append({date_field: date_range})
+        return combine_conditions(conditions)
+
+    # Sets
+
+    def clear(self):
+        with span('delete_many'):
+            self.workouts.delete_many({})
+            self.rollups_collection.delete_many({})
+
+    def insert_sets(self, df):
+        with span('to_dict'):
+            records = frame_to_records(df)
+        if not records:
+            return 0
+        with span('insert_many'):
+            result = self.workouts.insert_many(records, ordered=False)
+        # Every set is new, so its rollups can be added onto the stored ones
+        self.merge_rollups(df)
+        return len(result.inserted_ids)
+
+    def upsert_sets(self, df):
+        with span('to_dict'):
+            records = frame_to_records(df)
+        if not records:
+            return 0, 0, 0
+        # Rollup inputs of the stored sets about to be replaced, to find the sets whose rollups change
+        columns = [column for column in ROLLUP_SOURCE_COLUMNS if column in df.columns]
+        stored = self.load({'set_key': {'$in': df['set_key'].unique().tolist()}}, ['set_key'] + columns)
+        operations = [UpdateOne({'set_key': record['set_key']}, {'$set': record}, upsert=True) for record in records]
+        with span('bulk_write'):
+            result = self.workouts.bulk_write(operations, ordered=False)
+        stored = stored.drop_duplicates('set_key').reset_index(drop=True)
+        match = pd.Index(stored['set_key']).get_indexer(df['set_key'])
+        previous = stored.reindex(index=match, columns=columns).set_axis(df.index)
+        repeated = df['set_key'].duplicated(keep=False).to_numpy()
+        # The first row of a key that was not stored is the one its upsert inserted
+        new = (match < 0) & ~df['set_key'].duplicated().to_numpy()
+        # Keys repeated in the batch are re-aggregated too, as the stored set is whichever row was written last
+        modified = ~new & (repeated | changed_rows(df[columns], previous))
+        # New sets are added onto the stored rollups; only the weeks of changed sets are re-aggregated
+        if new.any():
+            self.merge_rollups(df[new])
+        if modified.any():
+            self.rebuild_touched_rollups(df[modified])
+        # Upserted documents count as matched=0; identical documents match without being modified
+        return result.upserted_count, result.modified_count, result.matched_count - result.modified_count
+
+    def ensure_set_keys(self):
+        # Replace uploads store no set_key, and keys from before occurrences were added are strings
+        if self.workouts.find_one({'$or': [{'set_key': None}, {'set_key': {'$type': 'string'}}]}, {'_id': 1}) is None:
+            return 0
+        keys = SetKeys()
+        keyed = 0
+        # _ids increase in upload order, so occurrences are counted as in the uploaded export
+        cursor = self.workouts.find({}, {'start_time': 1, 'exercise_title': 1, 'set_index': 1},
+                                    batch_size=self.batch_size).sort('_id', ASCENDING)
+        with span('bulk_write'):
+            while True:
+                documents = list(itertools.islice(cursor, self.batch_size))
+                if not documents:
+                    break
+                batch = pd.DataFrame(documents)
+                operations = [UpdateOne({'_id': _id}, {'$set': {'set_key': int(key)}})
+                              for _id, key in zip(batch['_id'], keys.assign(batch))]
+                self.workouts.bulk_write(operations, ordered=False)
+                keyed += len(operations)
+        return keyed
+
+    def exercises(self):
+        with span('mongo_distinct'):
+            return self.workouts.distinct('exercise_title')
+
+    def scan(self, exercise=None, date_from=None, date_to=None, columns=None):
+        return self.load(self.query(exercise, date_from, date_to), columns)
+
+    def load(self, query, columns=None):
+        projection = {'_id': 0, **{column: 1 for column in columns}} if columns else {'_id': 0, 'set_key': 0}
+        with span('mongo_find'):
+            documents = list(self.workouts.find(query, projection, batch_size=self.batch_size))
+        return pd.DataFrame(documents, columns=columns)
+
+    def iter_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order=None):
+        # set_key is an internal upsert key, so it is only returned when explicitly requested
+        projection = {'_id': 0, **{field: 1 for field in fields}} if fields else {'_id': 0, 'set_key': 0}
+        cursor = self.workouts.find(self.query(exercise, date_from, date_to), projection, batch_size=self.batch_size)
+        if order:
+            direction = ASCENDING if order == 'asc' else DESCENDING
+            cursor = cursor.sort([('start_time', direction), ('_id', direction)])
+        return cursor, cursor.close
+
+    def page_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order='asc', after=None, limit=100):
+        conditions = [self.query(exercise, date_from, date_to)]
+        direction = ASCENDING if order == 'asc' else DESCENDING
+        if after:
+            start_time, last_id = after
+            try:
+                last_id = ObjectId(last_id)
+            except (InvalidId, TypeError):
+                raise ValueError('Invalid cursor')
+            comparison = '$gt' if direction == ASCENDING else '$lt'
+            conditions.append({'$or': [
+                {'start_time': {comparison: start_time}},
+                {'start_time': start_time, '_id': {comparison: last_id}},
+            ]})
+        projection = {field: 1 for field in fields} if fields else {'set_key': 0}
+        # The sort key is always fetched so the next page's key can be built
+        if fields:
+            projection['start_time'] = 1
+        cursor = self.workouts.find(combine_conditions([c for c in conditions if c]), projection)
+        cursor = cursor.sort([('start_time', direction), ('_id', direction)])
+        # Fetch one extra document to know whether another page follows
+        with span('mongo_find'):
+            page = list(cursor.limit(limit + 1))
+        key = None
+        if len(page) > limit:
+            page = page[:limit]
+            key = (page[-1].get('start_time'), str(page[-1]['_id']))
+        for document in page:
+            document.pop('_id', None)
+            if fields and 'start_time' not in fields:
+                document.pop('start_time', None)
+        return page, key
+
+    # Rollups
+
+    def rollups(self, period, exercise=None, date_from=None, date_to=None):
+        query = combine_conditions([c for c in [{'period': period},
+                                                self.query(exercise, date_from, date_to, 'period_start')] if c])
+        with span('mongo_find'):
+            cursor = self.rollups_collection.find(query, {'_id': 0, 'period': 0})
+            return list(cursor.sort([('exercise_title', ASCENDING), ('period_start', ASCENDING)]))
+
+    def merge_rollups(self, df):
+        """Add newly inserted sets to the stored rollups: totals are incremented, maxima raised."""
+        operations = []
+        for document in rollup_documents(df):
+            key = {field: document[field] for field in ('period', 'exercise_title', 'period_start')}
+            update = {'$inc': {field: document[field] for field in SUM_FIELDS}}
+            maxima = {field: document[field] for field in MAX_FIELDS if document[field] is not None}
+            if maxima:
+                update['$max'] = maxima
+            operations.append(UpdateOne(key, update, upsert=True))
+        if operations:
+            with span('rollups'):
+                self.rollups_collection.bulk_write(operations, ordered=False)
+
+    def rebuild_rollups(self):
+        with span('rollups'):
+            self.rollups_collection.delete_many({})
+            # One exercise at a time keeps memory bounded by the largest exercise history
+            for exercise in self.workouts.distinct('exercise_title'):
+                documents = rollup_documents(self.scan(exercise, columns=ROLLUP_SOURCE_COLUMNS))
+                if documents:
+                    self.rollups_collection.insert_many(documents)
+        return self.rollups_collection.count_documents({})
+
+    def rebuild_touched_rollups(self, df):
+        """Recompute the rollups of every week touched by df's sets.
+
+        Upserts can change or replace existing sets, so their weeks are re-aggregated rather than incremented.
+        Consecutive touched weeks of an exercise are loaded as one range, and weeks in between are left alone.
+        """
+        if df.empty:
+            return
+        weeks = pd.DataFrame({'exercise_title': df['exercise_title'], 'week': period_starts(df['start_time'], 'week')})
+        weeks = weeks.dropna().drop_duplicates().sort_values(['exercise_title', 'week'], ignore_index=True)
+        # A new run starts at each exercise's first week and after every untouched week
+        starts = (weeks['exercise_title'].ne(weeks['exercise_title'].shift())
+                  | weeks['week'].diff().ne(pd.Timedelta(days=7)))
+        ranges = weeks.groupby(starts.cumsum()).agg(exercise_title=('exercise_title', 'first'),
+                                                    first=('week', 'min'), last=('week', 'max'))
+        sets_conditions, rollup_conditions = [], []
+        for _, exercise, first, last in ranges.itertuples():
+            week_range = {'$gte': first.to_pydatetime(), '$lt': (last + pd.Timedelta(days=7)).to_pydatetime()}
+            sets_conditions.append({'exercise_title': exercise, 'start_time': week_range})
+            rollup_conditions.append({'exercise_title': exercise, 'period_start': week_range})
+        if not sets_conditions:
+            return
+        with span('rollups'):
+            sets = self.load({'$or': sets_conditions}, ROLLUP_SOURCE_COLUMNS)
+            self.rollups_collection.delete_many({'$or': rollup_conditions})
+            documents = rollup_documents(sets)
+            if documents:
+                self.rollups_collection.insert_many(documents)
+
+    # Metadata
+
+    def dataset_version(self):
+        document = self.metadata.find_one({'_id': 'dataset'}) or {}
+        return document.get('version', 0)
+
+    def bump_dataset_version(self):
+        document = self.metadata.find_one_and_update(
+            {'_id': 'dataset'}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        return document['version']
+
+    @contextlib.contextmanager
+    def ingest_lock(self, owner):
+        """Hold the ingest lease in the metadata collection, so uploads in any worker process run one at a time.
+
+        Waits until the current holder releases the lease or lets it expire. A background thread
+        renews the lease while the block runs.
+        """
+        while True:
+            now = utcnow()
+            try:
+                self.metadata.update_one(
+                    {'_id': 'ingest_lock', '$or': [{'owner': None}, {'expires_at': {'$lt': now}}]},
+                    {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=self.lock_lease)}},
+                    upsert=True)
+                break
+            except DuplicateKeyError:
+                # The lock document exists and is held by someone else
+                time.sleep(self.lock_poll)
+
+        stop = threading.Event()
+        def renew():
+            while not stop.wait(self.lock_lease / 3):
+                self.metadata.update_one({'_id': 'ingest_lock', 'owner': owner},
+                                         {'$set': {'expires_at': utcnow() + timedelta(seconds=self.lock_lease)}})
+        renewer = threading.Thread(target=renew, name=f'ingest-lock-{owner}', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            self.metadata.update_one({'_id': 'ingest_lock', 'owner': owner}, {'$set': {'owner': None}})
+
+    # Upload jobs
+
+    def create_job(self, job):
+        self.jobs.insert_one(dict(job))
+
+    def update_job(self, job_id, **fields):
+        self.jobs.update_one({'_id': job_id}, {'$set': fields})
+
+    def get_job(self, job_id):
+        return self.jobs.find_one({'_id': job_id})
+
+def combine_conditions(conditions):
+    """AND a list of MongoDB conditions into a single query."""
+    return {'$and': conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+
+def rollup_documents(df):
+    """Daily and weekly rollup documents for the sets in df."""
+    return [{'period': period, **record} for period in PERIODS for record in frame_to_records(rollup_frame(df, period))]
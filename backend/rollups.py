@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from analytics import estimated_one_rep_max
+
+PERIODS = ('day', 'week')
+# Totals add up across batches of new sets; maxima merge with max
+SUM_FIELDS = ['sets', 'reps', 'volume_kg', 'distance_km', 'duration_seconds']
+MAX_FIELDS = ['max_weight_kg', 'best_e1rm_kg']
+
+def period_starts(times, period):
+    """Midnight of each set's day, or of the Monday starting its week."""
+    days = times.dt.normalize()
+    if period == 'week':
+        return days - pd.to_timedelta(days.dt.dayofweek, unit='D')
+    return days
+
+def rollup_frame(df, period):
+    """Per-exercise aggregates of df's sets for each day or week, one row per (exercise_title, period_start).
+
+    Volume is weight_kg x reps; the best e1RM only considers sets with positive weight and reps.
+    """
+    columns = ['exercise_title', 'period_start'] + SUM_FIELDS + MAX_FIELDS
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    weight = df['weight_kg'].astype('float64') if 'weight_kg' in df else pd.Series(np.nan, index=df.index)
+    reps = df['reps'].astype('float64') if 'reps' in df else pd.Series(np.nan, index=df.index)
+    lifting = (weight > 0) & (reps > 0)
+    frame = pd.DataFrame({
+        'exercise_title': df['exercise_title'],
+        'period_start': period_starts(df['start_time'], period),
+        'sets': 1,
+        'reps': reps.fillna(0),
+        'volume_kg': (weight * reps).fillna(0),
+        # Columns loaded from MongoDB are object dtype when every value is null
+        'distance_km': df['distance_km'].astype('float64').fillna(0) if 'distance_km' in df else 0.0,
+        'duration_seconds': df['duration_seconds'].astype('float64').fillna(0) if 'duration_seconds' in df else 0.0,
+        'max_weight_kg': weight,
+        'best_e1rm_kg': np.where(lifting, estimated_one_rep_max(weight.fillna(0), reps.fillna(0)), np.nan),
+    })
+    grouped = frame.groupby(['exercise_title', 'period_start'], sort=True)
+    result = grouped[SUM_FIELDS].sum().join(grouped[MAX_FIELDS].max())
+    result['sets'] = result['sets'].astype('int64')
+    return result.reset_index()[columns]
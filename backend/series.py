@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+DATE_AXES = {'start_time', 'end_time'}
+# Segments spanning more than this many days are drawn as gaps by both frontends
+GAP_DAYS = 7
+
+def lttb_indices(x, y, budget):
+    """Largest-Triangle-Three-Buckets: indices of `budget` points that keep the series' visual shape.
+
+    x must be sorted ascending. The first and last points are always kept.
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+    if budget < 3:
+        return np.array([0, n - 1][:budget])
+    # budget - 2 buckets over the interior points, each at least one point wide
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    selected = np.empty(budget, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(budget - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        # Twice the area of the triangle (anchor, candidate, next bucket's average)
+        area = np.abs((x[anchor] - average_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (average_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+def gap_flags(times, indices):
+    """For each selected point, whether any raw step since the previous selected point exceeds GAP_DAYS."""
+    flags = np.zeros(len(indices), dtype=bool)
+    if len(indices) < 2:
+        return flags
+    nanoseconds = times.astype('datetime64[ns]').astype(np.int64)
+    steps = np.diff(nanoseconds, prepend=nanoseconds[0])
+    widest = np.maximum.reduceat(steps[:indices[-1] + 1], indices[:-1] + 1)
+    flags[1:] = widest > GAP_DAYS * 86_400 * 10**9
+    return flags
+
+def even_spacing(times, values, budget):
+    """Calendar grid from the first to the last day, gap-filled with nulls.
+
+    With at most `budget` days, each day holds its last set, as in the static report's
+    even date spacing. Longer ranges use buckets of several days that keep their minimum
+    and maximum sets, so the output never exceeds the budget.
+    Returns grid dates, raw indices (-1 for empty slots) and the bucket width in days.
+    """
+    days = times.astype('datetime64[D]')
+    offsets = (days - days[0]).astype(np.int64)
+    span = int(offsets[-1]) + 1
+    step = 1 if span <= budget else math.ceil(span / max(budget // 2, 1))
+    buckets = offsets // step
+    if step == 1:
+        # Sorted input, so the last index of each day is its last set
+        last = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+        chosen = zip(buckets[last], last)
+    else:
+        grouped = pd.Series(values).groupby(buckets)
+        chosen = sorted({(bucket, index) for bucket, index in grouped.idxmin().items()}
+                        | {(bucket, index) for bucket, index in grouped.idxmax().items()})
+    slots = {}
+    for bucket, index in chosen:
+        slots.setdefault(int(bucket), []).append(int(index))
+    grid, indices = [], []
+    for bucket in range(math.ceil(span / step)):
+        date = days[0] + np.timedelta64(bucket * step, 'D')
+        for index in slots.get(bucket, [-1]):
+            grid.append(date)
+            indices.append(index)
+    return np.array(grid, dtype='datetime64[D]'), np.array(indices, dtype=int), step
+
+def build_series(df, x, y, budget, even=False):
+    """Sorted, optionally gap-filled and downsampled chart series for columns x and y of df.
+
+    Returns a dict of parallel lists: x, y, the actual set date of each point (null for
+    gap-filled slots) and whether the segment leading to it spans a gap of over GAP_DAYS.
+    """
+    is_date = x in DATE_AXES
+    df = df.dropna(subset=[x, y])
+    df = df.sort_values([x, 'start_time'] if x != 'start_time' else x, kind='stable').reset_index(drop=True)
+    values = df[y].to_numpy(dtype=float)
+    times = df['start_time'].to_numpy(dtype='datetime64[ns]')
+    result = {'total_points': len(df), 'step_days': None}
+    if df.empty:
+        return {**result, 'x': [], 'y': [], 'date': [], 'gap': []}
+
+    if is_date:
+        axis = df[x].to_numpy(dtype='datetime64[ns]')
+        if even:
+            grid, indices, step = even_spacing(axis, values, budget)
+            filled = indices >= 0
+            gaps = np.zeros(len(indices), dtype=bool)
+            gaps[filled] = gap_flags(axis, indices[filled])
+            x_values = pd.to_datetime(grid).tolist()
+            result['step_days'] = step
+        else:
+            indices = lttb_indices(axis.astype(np.int64).astype(float), values, budget)
+            filled = np.ones(len(indices), dtype=bool)
+            gaps = gap_flags(axis, indices)
+            x_values = pd.to_datetime(axis[indices]).tolist()
+    else:
+        axis = df[x].to_numpy(dtype=float)
+        indices = lttb_indices(axis, values, budget)
+        filled = np.ones(len(indices), dtype=bool)
+        gaps = np.zeros(len(indices), dtype=bool)
+        x_values = axis[indices].tolist()
+
+    safe = np.where(filled, indices, 0)
+    dates = pd.to_datetime(times[safe])
+    return {
+        **result,
+        'x': x_values,
+        'y': [float(values[i]) if ok else None for i, ok in zip(safe, filled)],
+        'date': [date if ok else None for date, ok in zip(dates, filled)],
+        'gap': gaps.tolist(),
+    }
@@ -0,0 +1,147 @@
+"""Storage backends for workout sets, their rollups, upload jobs and shared metadata.
+
+app.py only talks to a Store. MongoStore (mongo_store.py) keeps everything in MongoDB;
+ColumnStore (column_store.py) keeps it in local memory-mapped column files.
+"""
+import abc
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Columns aggregated into rollups
+ROLLUP_SOURCE_COLUMNS = ['exercise_title', 'start_time', 'weight_kg', 'reps', 'distance_km', 'duration_seconds']
+
+def utcnow():
+    """Naive UTC now, the form MongoDB returns dates in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def changed_rows(new, old):
+    """Whether each row of new differs from the row of old with the same key, treating missing values as equal."""
+    changed = np.zeros(len(new), dtype=bool)
+    for column in new.columns:
+        if column not in old.columns:
+            changed |= new[column].notna().to_numpy()
+            continue
+        a, b = new[column], old[column]
+        same = (a.isna() & b.isna()) | (a == b).fillna(False).astype(bool)
+        changed |= ~same.to_numpy()
+    return changed
+
+class Store(abc.ABC):
+    """Interface shared by the storage backends; each must implement every method.
+
+    Sets come in as validated DataFrames (see validation.validate_workouts_frame), with a
+    set_key column (see validation.SetKeys) for upserts and bulk imports. They go out as
+    DataFrames or dicts with the same columns, minus set_key unless asked for. Filters are an
+    exercise title (None for all) and an inclusive start_time range.
+    """
+
+    name = None
+    # Span under which reads of stored sets are timed
+    read_span = None
+
+    @abc.abstractmethod
+    def ping(self):
+        """Raise if the backend is unreachable."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def drop(self):
+        """Delete everything the store holds, e.g. a scratch benchmark database."""
+        raise NotImplementedError
+
+    # Sets
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove every set and rollup."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def insert_sets(self, df):
+        """Add new sets, returning how many were inserted."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def upsert_sets(self, df):
+        """Insert or replace sets by set_key, returning (inserted, updated, unchanged) counts."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def ensure_set_keys(self):
+        """Key every stored set that lacks a current set_key, so upserts can match it.
+
+        Replace uploads store sets without keys, so the first incremental upload after one keys
+        the stored history once. Returns how many sets were keyed.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exercises(self):
+        """Distinct exercise titles."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def scan(self, exercise=None, date_from=None, date_to=None, columns=None):
+        """DataFrame of matching sets, restricted to columns (every column but set_key when None)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def iter_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order=None):
+        """Matching sets as dicts, sorted by start_time when order is 'asc' or 'desc'.
+
+        Returns (iterator, close), where close releases the underlying cursor.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def page_sets(self, exercise=None, date_from=None, date_to=None, fields=None, order='asc', after=None, limit=100):
+        """One page of keyset pagination over (start_time, tiebreaker).
+
+        after is the key returned for the previous page. Returns (sets, key), where key is
+        None on the last page and a (start_time, tiebreaker string) pair otherwise.
+        """
+        raise NotImplementedError
+
+    # Rollups
+
+    @abc.abstractmethod
+    def rollups(self, period, exercise=None, date_from=None, date_to=None):
+        """Rollup rows for period ('day' or 'week') whose period_start is in range, by exercise and date."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def rebuild_rollups(self):
+        """Recompute every stored rollup; returns how many are stored, or None if they are computed on read."""
+        raise NotImplementedError
+
+    # Metadata shared by all worker processes
+
+    @abc.abstractmethod
+    def dataset_version(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def bump_dataset_version(self):
+        """Increment and return the dataset version, invalidating every worker's cached responses."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def ingest_lock(self, owner):
+        """Context manager serializing uploads across threads and worker processes."""
+        raise NotImplementedError
+
+    # Upload jobs
+
+    @abc.abstractmethod
+    def create_job(self, job):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def update_job(self, job_id, **fields):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_job(self, job_id):
+        """The job document, or None for unknown ids."""
+        raise NotImplementedError
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# The backend modules import each other as top-level modules, as when app.py is run from backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BACKEND_DIR), 'benchmarks'))
+# generate_workouts_html.py lives at the repository root
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+
+try:
+    import mongomock.collection
+except ImportError:
+    pass
+else:
+    # pymongo 4.11 passes a sort option to bulk updates; mongomock 4.3 does not accept it, and has no order to apply
+    _add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+    def add_update(self, *args, sort=None, **kwargs):
+        return _add_update(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = add_update
@@ -0,0 +1,147 @@
+import gzip
+import importlib
+import io
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from synthetic_export import synthetic_export
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Each test gets an empty column store, so no database is needed
+    monkeypatch.setenv('STORAGE_BACKEND', 'column')
+    monkeypatch.setenv('COLUMN_STORE_DIR', str(tmp_path / 'columns'))
+    module = importlib.import_module('app')
+    monkeypatch.setattr(module, 'UPLOAD_SPOOL_DIR', str(tmp_path / 'spool'))
+    monkeypatch.setattr(module, 'BULK_IMPORT_WORKERS', 1)
+    monkeypatch.setattr(module, '_store_key', None)
+    module.connect_store()
+    return module
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+def export_csv(rows=50, seed=1):
+    return synthetic_export(rows, seed=seed).to_csv(index=False).encode()
+
+def upload(client, body, query=''):
+    return client.post(f'/api/upload{query}', data={'file': (io.BytesIO(body), 'workouts.csv')},
+                       content_type='multipart/form-data')
+
+@pytest.mark.parametrize('query', ['?mode=bogus', '?mode=incremantal', '?mode=bogus&async=1'])
+def test_upload_rejects_unknown_modes_without_touching_the_stored_sets(client, query):
+    assert upload(client, export_csv()).status_code == 200
+    response = upload(client, export_csv(10, seed=2), query)
+    assert response.status_code == 400
+    assert 'Unknown upload mode' in response.get_json()['error']
+    assert len(client.get('/api/workouts').get_json()) == 50
+
+def test_rollup_rebuilds_wait_for_running_uploads(app, client):
+    responses = []
+    with app.store.ingest_lock('upload'):
+        rebuild = threading.Thread(target=lambda: responses.append(client.post('/api/rollups/rebuild')))
+        rebuild.start()
+        rebuild.join(0.5)
+        assert rebuild.is_alive()
+    rebuild.join(5)
+    assert responses[0].status_code == 200
+
+def test_a_date_only_to_includes_that_day(client):
+    export = synthetic_export(3, seed=1)
+    export['start_time'] = ['29 Feb 2024, 18:00', '1 Mar 2024, 10:00', '2 Mar 2024, 10:00']
+    upload(client, export.to_csv(index=False).encode())
+    sets = client.get('/api/workouts?from=2024-03-01&to=2024-03-01').get_json()
+    assert [workout['start_time'] for workout in sets] == ['2024-03-01T10:00:00']
+    assert client.get('/api/workouts?to=2024-03-01T09:00').get_json()[-1]['start_time'] == '2024-02-29T18:00:00'
+    rollups = client.get('/api/rollups?period=day&from=2024-03-01&to=2024-03-01').get_json()
+    assert {rollup['period_start'] for rollup in rollups} == {'2024-03-01T00:00:00'}
+
+def test_replace_uploads_report_their_rate(app):
+    updates = []
+    stats = app.replace_upload(io.BytesIO(export_csv()), progress=lambda phase, counts: updates.append((phase, counts)))
+    assert [phase for phase, _ in updates] == ['parsing', 'validating', 'writing']
+    assert all('rows_per_second' in counts for _, counts in updates)
+    assert stats['rows_read'] == stats['inserted'] == 50
+    assert stats['rows_per_second'] > 0
+
+def test_etags_answer_304_until_an_upload_changes_the_data(client):
+    upload(client, export_csv())
+    first = client.get('/api/workouts')
+    etag = first.headers['ETag']
+    assert client.get('/api/workouts', headers={'If-None-Match': etag}).status_code == 304
+    # The same query with other arguments is another cache entry
+    assert client.get('/api/workouts?exercise=Squat', headers={'If-None-Match': etag}).status_code == 200
+
+    upload(client, export_csv(20, seed=2))
+    after = client.get('/api/workouts', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert len(after.get_json()) == 20
+
+def test_stream_and_incremental_uploads(client):
+    body = synthetic_export(60, seed=1)
+    assert upload(client, body.iloc[:50].to_csv(index=False).encode(), '?mode=stream').get_json()['inserted'] == 50
+    body.loc[0, 'reps'] = 99
+    stats = upload(client, body.to_csv(index=False).encode(), '?mode=incremental').get_json()
+    assert (stats['inserted'], stats['updated'], stats['unchanged']) == (10, 1, 49)
+    assert len(client.get('/api/workouts').get_json()) == 60
+
+def wait_for_job(client, response):
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert response.headers['Location'] == status_url
+    for _ in range(100):
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Upload job still {job["status"]}')
+
+def test_async_uploads_report_their_job_status(client):
+    job = wait_for_job(client, upload(client, export_csv(), '?async=1'))
+    assert job['status'] == 'done' and job['mode'] == 'replace'
+    assert (job['rows_read'], job['inserted'], job['rejected']) == (50, 50, 0)
+    assert job['rows_per_second'] > 0
+    assert len(client.get('/api/workouts').get_json()) == 50
+    assert client.get('/api/upload/unknown').status_code == 404
+
+def test_bulk_uploads_skip_sets_repeated_across_files(client):
+    both = synthetic_export(60, seed=1)
+    files = [(io.BytesIO(both.iloc[:40].to_csv(index=False).encode()), 'old.csv'),
+             (io.BytesIO(gzip.compress(both.to_csv(index=False).encode())), 'new.csv.gz')]
+    response = client.post('/api/upload/bulk', data={'files': files}, content_type='multipart/form-data')
+    stats = response.get_json()
+    assert response.status_code == 200
+    assert (stats['files'], stats['inserted'], stats['duplicates']) == (2, 60, 40)
+    assert len(client.get('/api/workouts').get_json()) == 60
+    response = client.post('/api/upload/bulk?mode=bogus', data={'files': [(io.BytesIO(b''), 'a.csv')]},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('key', [(datetime(2024, 3, 1, 10, 0), 'Squat:42'), (None, '9')])
+def test_page_cursors_round_trip(app, key):
+    assert app.decode_page_cursor(app.encode_page_cursor(key)) == key
+
+# Not base64, an empty object, and a start_time that is not a date
+@pytest.mark.parametrize('token', ['garbage', 'e30=', 'eyJzdGFydF90aW1lIjogIngiLCAia2V5IjogMX0='])
+def test_invalid_page_cursors_are_rejected(app, client, token):
+    with pytest.raises(ValueError):
+        app.decode_page_cursor(token)
+    assert client.get(f'/api/workouts?limit=5&after={token}').status_code == 400
+
+def test_pages_follow_the_next_cursor(client):
+    upload(client, export_csv(120))
+    sets, cursor = [], None
+    while True:
+        response = client.get('/api/workouts?limit=25&fields=start_time,exercise_title,set_index'
+                              + (f'&after={cursor}' if cursor else ''))
+        sets += response.get_json()
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert len(sets) == 120
+    assert sets == client.get('/api/workouts?order=asc&fields=start_time,exercise_title,set_index').get_json()
@@ -0,0 +1,48 @@
+import io
+
+import pandas as pd
+import pytest
+
+import bulk_import
+from bulk_import import byte_ranges, read_part
+
+ROWS = pd.DataFrame({
+    'start_time': ['1 Jan 2024, 10:00'] * 6,
+    'exercise_title': ['Squat', 'Bench Press', 'Squat', 'Deadlift', 'Squat', 'Row'],
+    'exercise_notes': ['plain', 'two\nlines', 'a "quoted" word', '"\n"\n""', '', 'ends with newline\n'],
+    'set_index': range(6),
+})
+
+def parts_of(path, target_bytes):
+    header, ranges = byte_ranges(path, target_bytes)
+    return [read_part({'path': str(path), 'header': header, 'start': start, 'end': end}) for start, end in ranges], \
+        ranges
+
+@pytest.mark.parametrize('target_bytes', [1, 7, 20, 64, 10_000])
+@pytest.mark.parametrize('block_bytes', [3, 16, 1024])
+def test_byte_ranges_only_split_at_row_boundaries(tmp_path, monkeypatch, target_bytes, block_bytes):
+    # Small scan blocks put quotes and newlines on both sides of block boundaries
+    monkeypatch.setattr(bulk_import, 'SCAN_BLOCK_BYTES', block_bytes)
+    path = tmp_path / 'export.csv'
+    ROWS.to_csv(path, index=False)
+    parts, ranges = parts_of(path, target_bytes)
+    # The ranges cover the file after the header without gaps or overlaps
+    assert [start for start, _ in ranges[1:]] == [end for _, end in ranges[:-1]]
+    assert ranges[-1][1] == path.stat().st_size
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True).fillna(''), ROWS.fillna(''),
+                                  check_dtype=False)
+
+def test_byte_ranges_split_large_files_into_several_parts(tmp_path):
+    path = tmp_path / 'export.csv'
+    pd.concat([ROWS] * 50, ignore_index=True).to_csv(path, index=False)
+    parts, ranges = parts_of(path, 500)
+    assert len(ranges) > 5
+    assert sum(map(len, parts)) == 300
+
+def test_byte_ranges_of_a_file_without_a_trailing_newline(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_bytes(ROWS.to_csv(index=False).encode().rstrip(b'\n'))
+    parts, _ = parts_of(path, 10)
+    assert sum(map(len, parts)) == len(ROWS)
+    assert pd.read_csv(io.BytesIO(path.read_bytes()))['exercise_title'].tolist() == \
+        pd.concat(parts)['exercise_title'].tolist()
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_store import ColumnStore, decode_values, encode_values
+from mongo_store import MongoStore
+from storage import Store
+from synthetic_export import synthetic_export
+from validation import SetKeys, validate_workouts_frame
+
+def round_trip(series):
+    values, spec = encode_values(series)
+    return decode_values(values, spec), spec
+
+def test_dictionary_encoding_is_lossless():
+    values = ['Bench Press', '', 'Ünïcode ✓', 'quote "and" comma, \\ \n', '\ud800', None, True, 3, 2.5,
+              np.int64(7), 10 ** 20, 'Bench Press']
+    decoded, spec = round_trip(pd.Series(values, dtype=object))
+    assert spec['kind'] == 'dictionary'
+    expected = [value.item() if isinstance(value, np.generic) else value for value in values]
+    assert list(decoded) == expected
+    assert [type(value) for value in decoded] == [type(value) for value in expected]
+
+def test_dictionary_encoding_rejects_values_json_would_alter():
+    with pytest.raises(TypeError):
+        encode_values(pd.Series(['a', pd.Timestamp('2024-01-01'), ('a', 'b')], dtype=object, name='notes'))
+
+@pytest.mark.parametrize('series', [
+    pd.Series([1.5, np.nan, -0.0]),
+    pd.Series([1, 2, 2 ** 62], dtype='int64'),
+    pd.Series([1, 2], dtype='Int64'),
+    pd.Series([1, None], dtype='Int64'),
+    pd.Series([True, False]),
+])
+def test_numbers_round_trip(series):
+    decoded, spec = round_trip(series)
+    assert spec['kind'] == 'number'
+    assert np.array_equal(decoded.astype(float), series.astype(float).to_numpy(), equal_nan=True)
+
+def test_datetimes_are_stored_as_naive_utc():
+    series = pd.Series(pd.to_datetime(['2024-01-01 10:00', None]).tz_localize('Europe/Berlin'))
+    decoded, spec = round_trip(series)
+    assert spec['kind'] == 'datetime'
+    assert decoded[0] == np.datetime64('2024-01-01T09:00', 'ns')
+    assert np.isnat(decoded[1])
+
+def test_segments_round_trip(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    frame = pd.DataFrame({
+        'start_time': pd.to_datetime(['2024-01-02 10:00', '2024-01-01 10:00']),
+        'exercise_title': ['Squat', 'Squat'],
+        'exercise_notes': ['felt "heavy"', None],
+        'weight_kg': [100.0, np.nan],
+    })
+    stored = store.read_segments([store.write_segment(frame)])
+    assert list(stored.columns) == list(frame.columns)
+    # Rows come back sorted by start_time
+    assert stored['start_time'].tolist() == [pd.Timestamp('2024-01-01 10:00'), pd.Timestamp('2024-01-02 10:00')]
+    assert stored['exercise_notes'].isna().tolist() == [True, False]
+    assert stored['exercise_notes'].iloc[1] == 'felt "heavy"'
+    assert stored['weight_kg'].isna().tolist() == [True, False]
+
+def test_every_store_implements_the_interface():
+    with pytest.raises(TypeError):
+        Store()
+    assert not ColumnStore.__abstractmethods__
+    assert not MongoStore.__abstractmethods__
+
+def keyed_sets(rows):
+    valid, _ = validate_workouts_frame(pd.DataFrame(rows, columns=['start_time', 'exercise_title', 'set_index',
+                                                                   'weight_kg', 'reps']))
+    valid['set_key'] = SetKeys().assign(valid)
+    return valid
+
+SETS = [
+    ['1 Jan 2024, 10:00', 'Squat', 0, 100, 5],
+    ['1 Jan 2024, 10:00', 'Squat', 1, 110, 3],
+    ['1 Jan 2024, 10:00', 'Bench Press', 0, 60, 8],
+    ['3 Jan 2024, 10:00', 'Squat', 0, 105, 5],
+]
+
+def test_upsert_counts(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    sets = keyed_sets(SETS)
+    assert store.upsert_sets(sets) == (4, 0, 0)
+    assert store.upsert_sets(sets) == (0, 0, 4)
+    changed = sets.copy()
+    changed.loc[1, 'weight_kg'] = 112.5
+    more = keyed_sets(SETS + [['5 Jan 2024, 10:00', 'Squat', 0, 107.5, 5]]).iloc[[4]]
+    assert store.upsert_sets(pd.concat([changed, more], ignore_index=True)) == (1, 1, 3)
+    stored = store.scan(columns=['exercise_title', 'weight_kg'])
+    assert len(stored) == 5
+    assert sorted(stored['weight_kg']) == [60, 100, 105, 107.5, 112.5]
+
+def test_upsert_compares_repeated_keys_with_the_previous_row_of_the_batch(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    sets = keyed_sets(SETS[:1])
+    twice = pd.concat([sets, sets.assign(weight_kg=120.0), sets.assign(weight_kg=120.0)], ignore_index=True)
+    assert store.upsert_sets(twice) == (1, 1, 1)
+    assert store.scan(columns=['weight_kg'])['weight_kg'].tolist() == [120.0]
+
+def test_upsert_keeps_stored_columns_missing_from_the_upload(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    sets = keyed_sets(SETS)
+    store.upsert_sets(sets)
+    assert store.upsert_sets(sets.drop(columns='reps').assign(weight_kg=sets['weight_kg'] + 1)) == (0, 4, 0)
+    stored = store.scan(columns=['weight_kg', 'reps']).sort_values('weight_kg', ignore_index=True)
+    assert stored['reps'].tolist() == [8, 5, 5, 3]
+
+def test_upsert_only_rewrites_segments_holding_changed_sets(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    sets = keyed_sets(SETS + [['5 Jan 2024, 10:00', 'Squat', 0, 107.5, 5]])
+    store.upsert_sets(sets.iloc[:4])
+    first = store.manifest()['partitions']['Squat']
+    bench = store.manifest()['partitions']['Bench Press']
+    # New sets are added as a segment of their own
+    assert store.upsert_sets(sets) == (1, 0, 4)
+    appended = store.manifest()['partitions']['Squat']
+    assert appended[:-1] == first and len(appended) == 2
+    # A changed set rewrites its own segment and leaves the others as they are
+    assert store.upsert_sets(sets.assign(weight_kg=sets['weight_kg'].where(sets.index != 4, 110.0))) == (0, 1, 4)
+    rewritten = store.manifest()['partitions']['Squat']
+    assert rewritten[0] == first[0] and len(rewritten) == 2
+    assert store.manifest()['partitions']['Bench Press'] == bench
+    assert sorted(store.scan(exercise='Squat', columns=['weight_kg'])['weight_kg']) == [100, 105, 110, 110]
+
+def all_pages(store, order, limit, **filters):
+    sets, after, pages = [], None, 0
+    while True:
+        page, after = store.page_sets(order=order, after=after, limit=limit, **filters)
+        sets += page
+        pages += 1
+        if after is None:
+            return sets, pages
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_keyset_pages_match_the_ordered_sets(tmp_path, order):
+    store = ColumnStore(str(tmp_path), max_segments=2)
+    valid, _ = validate_workouts_frame(synthetic_export(600, seed=5))
+    # Several uploads give each partition several segments; whole workouts share a start_time
+    for start in range(0, 600, 150):
+        store.insert_sets(valid.iloc[start:start + 150])
+    iterator, close = store.iter_sets(fields=['start_time', 'exercise_title', 'set_index'], order=order)
+    expected = list(iterator)
+    close()
+    pages, count = all_pages(store, order, 37, fields=['start_time', 'exercise_title', 'set_index'])
+    assert pages == expected
+    assert count == 600 // 37 + 1
+
+def test_keyset_pages_with_filters(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    valid, _ = validate_workouts_frame(synthetic_export(600, seed=5))
+    store.insert_sets(valid)
+    exercise = store.exercises()[0]
+    date_from, date_to = valid['start_time'].quantile(0.25), valid['start_time'].quantile(0.75)
+    pages, _ = all_pages(store, 'asc', 10, exercise=exercise, date_from=date_from, date_to=date_to)
+    expected = valid[(valid['exercise_title'] == exercise) & valid['start_time'].between(date_from, date_to)]
+    assert len(pages) == len(expected)
+    assert [page['start_time'] for page in pages] == sorted(expected['start_time'])
+
+@pytest.mark.parametrize('after', [(None, 'garbage'), (None, None), (None, 'x:Squat')])
+def test_keyset_rejects_invalid_cursors(tmp_path, after):
+    store = ColumnStore(str(tmp_path))
+    store.insert_sets(keyed_sets(SETS))
+    with pytest.raises(ValueError):
+        store.page_sets(after=after)
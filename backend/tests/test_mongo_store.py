@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongo_store  # noqa: E402
+from mongo_store import MongoStore  # noqa: E402
+from synthetic_export import synthetic_export  # noqa: E402
+from validation import SetKeys, validate_workouts_frame  # noqa: E402
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(mongo_store, 'MongoClient', mongomock.MongoClient)
+    store = MongoStore('mongodb://localhost', 'tests')
+    yield store
+    store.drop()
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_keyset_pages_match_the_ordered_sets(store, order):
+    valid, _ = validate_workouts_frame(synthetic_export(300, seed=5))
+    store.insert_sets(valid)
+    iterator, close = store.iter_sets(fields=['start_time', 'exercise_title', 'set_index'], order=order)
+    expected = list(iterator)
+    close()
+    sets, after = [], None
+    while True:
+        page, after = store.page_sets(fields=['start_time', 'exercise_title', 'set_index'], order=order, after=after,
+                                      limit=37)
+        sets += page
+        if after is None:
+            break
+    assert sets == expected
+
+def test_keyset_rejects_invalid_cursors(store):
+    with pytest.raises(ValueError):
+        store.page_sets(after=(None, 'not-an-object-id'))
+
+def test_upsert_counts(store):
+    valid, _ = validate_workouts_frame(synthetic_export(200, seed=6))
+    valid['set_key'] = SetKeys().assign(valid)
+    assert store.upsert_sets(valid.iloc[:150]) == (150, 0, 0)
+    changed = valid.copy()
+    changed.loc[changed.index[:5], 'reps'] += 1
+    assert store.upsert_sets(changed) == (50, 5, 145)
+    assert store.workouts.count_documents({}) == 200
+
+def test_upsert_rollups_match_a_rebuild(store):
+    valid, _ = validate_workouts_frame(synthetic_export(300, seed=7))
+    valid['set_key'] = SetKeys().assign(valid)
+    store.upsert_sets(valid.iloc[:200])
+    changed = valid.copy()
+    changed.loc[changed.index[[3, 150]], 'weight_kg'] += 2.5
+    store.upsert_sets(changed)
+    columns = ['exercise_title', 'period_start', 'sets', 'reps', 'volume_kg', 'max_weight_kg']
+    maintained = pd.DataFrame(store.rollups('week'))[columns]
+    store.rebuild_rollups()
+    pd.testing.assert_frame_equal(maintained, pd.DataFrame(store.rollups('week'))[columns])
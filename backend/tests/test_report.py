@@ -0,0 +1,76 @@
+import json
+import os
+
+import generate_workouts_html as report
+from synthetic_export import synthetic_export
+
+def embedded_data(html):
+    start = html.index('id="workoutData">') + len('id="workoutData">')
+    return json.loads(html[start:html.index('</script>', start)])
+
+def test_embedded_page_holds_the_precomputed_data():
+    df = synthetic_export(300, seed=1)
+    df.loc[0, 'exercise_notes'] = 'closes </script> early'
+    html = report.build_embedded_page(report.parse_date_columns(df))
+    data = embedded_data(html)
+    assert data['length'] == 300
+    assert data['exercises'] == sorted(df['exercise_title'].unique())
+    assert data['values']['exercise_notes'][0] == 'closes </script> early'
+    # One top set per workout and exercise
+    assert sum(data['topSet']) == len(df.drop_duplicates(['start_time', 'exercise_title']))
+    assert sorted(i for rows in data['series'] for i in rows) == list(range(300))
+    starts = [data['values']['start_time'][i] for i in data['order']]
+    assert starts == sorted(starts)
+
+def read_shards(output_dir):
+    shards = {}
+    for name in os.listdir(os.path.join(output_dir, 'shards')):
+        with open(os.path.join(output_dir, 'shards', name), encoding='utf-8') as f:
+            text = f.read()
+        shards[name] = json.loads(text[text.index(', ') + 2:text.rindex(');')])
+    return shards
+
+def build(csv_path, output_dir):
+    cache_dir = os.path.join(output_dir, '.cache')
+    frames, meta, status = report.load_workouts_cached(str(csv_path), cache_dir)
+    return status, report.build_sharded_report(frames, meta, str(output_dir), cache_dir)
+
+def test_sharded_report_writes_one_shard_per_exercise(tmp_path):
+    df = synthetic_export(300, seed=2)
+    csv_path = tmp_path / 'workouts.csv'
+    df.to_csv(csv_path, index=False)
+    status, written = build(csv_path, tmp_path / 'report')
+    assert status == 'parsed 300 rows'
+    assert written == df['exercise_title'].nunique()
+    shards = read_shards(tmp_path / 'report')
+    assert set(shards) == {report.shard_file_name(exercise) for exercise in df['exercise_title'].unique()}
+    assert sum(shard['length'] for shard in shards.values()) == 300
+    assert (tmp_path / 'report' / 'index.html').exists()
+    assert build(csv_path, tmp_path / 'report') == ('unchanged', 0)
+
+def test_appended_rows_only_rewrite_their_exercises_shards(tmp_path):
+    df = synthetic_export(400, seed=3)
+    head, tail = df.iloc[:300], df.iloc[300:]
+    csv_path = tmp_path / 'workouts.csv'
+    head.to_csv(csv_path, index=False)
+    build(csv_path, tmp_path / 'report')
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write(tail.to_csv(index=False, header=False))
+
+    status, written = build(csv_path, tmp_path / 'report')
+    assert status == 'appended 100 rows'
+    assert written == tail['exercise_title'].nunique()
+    # The appended build matches a build of the whole export from scratch
+    assert build(csv_path, tmp_path / 'fresh') == ('parsed 400 rows', df['exercise_title'].nunique())
+    assert read_shards(tmp_path / 'report') == read_shards(tmp_path / 'fresh')
+
+def test_rewritten_exports_drop_shards_of_missing_exercises(tmp_path):
+    df = synthetic_export(300, seed=4)
+    csv_path = tmp_path / 'workouts.csv'
+    df.to_csv(csv_path, index=False)
+    build(csv_path, tmp_path / 'report')
+    dropped = df['exercise_title'].iloc[0]
+    df[df['exercise_title'] != dropped].to_csv(csv_path, index=False)
+    status, _ = build(csv_path, tmp_path / 'report')
+    assert status.startswith('parsed')
+    assert report.shard_file_name(dropped) not in read_shards(tmp_path / 'report')
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from series import GAP_DAYS, build_series, gap_flags, lttb_indices
+
+def test_lttb_returns_every_point_within_budget():
+    x = np.arange(5, dtype=float)
+    assert lttb_indices(x, x, 5).tolist() == [0, 1, 2, 3, 4]
+
+@pytest.mark.parametrize('budget', [1, 2, 3, 10, 99])
+def test_lttb_keeps_the_ends_and_returns_budget_sorted_points(budget):
+    rng = np.random.default_rng(0)
+    x = np.arange(1000, dtype=float)
+    indices = lttb_indices(x, rng.normal(size=1000), budget)
+    assert len(indices) == budget
+    assert indices[0] == 0
+    if budget > 1:
+        assert indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(1000)
+    y[[137, 600]] = [50, -40]
+    indices = lttb_indices(np.arange(1000, dtype=float), y, 20)
+    assert {137, 600} <= set(indices.tolist())
+
+def test_gap_flags_mark_points_after_a_long_break():
+    days = np.array([0, 1, 2, 3, 20, 21, 22, 40], dtype='timedelta64[D]') + np.datetime64('2024-01-01')
+    times = days.astype('datetime64[ns]')
+    assert gap_flags(times, np.arange(8)).tolist() == [False, False, False, False, True, False, False, True]
+    # The break between raw points 3 and 4 is flagged on the next selected point, even when neither is selected
+    assert gap_flags(times, np.array([0, 2, 5, 6])).tolist() == [False, False, True, False]
+    assert gap_flags(times, np.array([0])).tolist() == [False]
+
+def test_gap_flags_threshold_is_exclusive():
+    times = np.array(['2024-01-01', '2024-01-01'], dtype='datetime64[ns]')
+    times[1] += np.timedelta64(GAP_DAYS, 'D')
+    assert gap_flags(times, np.array([0, 1])).tolist() == [False, False]
+    times[1] += np.timedelta64(1, 's')
+    assert gap_flags(times, np.array([0, 1])).tolist() == [False, True]
+
+def test_build_series_downsamples_to_the_budget():
+    start = pd.Timestamp('2024-01-01')
+    df = pd.DataFrame({'start_time': [start + pd.Timedelta(days=i // 3) for i in range(600)],
+                       'weight_kg': np.linspace(50, 100, 600)})
+    df.loc[[10, 20], 'weight_kg'] = np.nan
+    series = build_series(df, 'start_time', 'weight_kg', 50)
+    assert series['total_points'] == 598
+    assert len(series['x']) == len(series['y']) == len(series['date']) == len(series['gap']) == 50
+    assert series['y'][0] == 50 and series['y'][-1] == 100
+    assert not any(series['gap'])
+
+def test_even_spacing_fills_missing_days_with_nulls():
+    df = pd.DataFrame({'start_time': pd.to_datetime(['2024-01-01 08:00', '2024-01-03 08:00', '2024-01-03 18:00']),
+                       'weight_kg': [60.0, 62.5, 65.0]})
+    series = build_series(df, 'start_time', 'weight_kg', 50, even=True)
+    assert series['step_days'] == 1
+    assert series['y'] == [60.0, None, 65.0]
+    assert series['date'][1] is None
@@ -0,0 +1,5 @@
+from synthetic_export import synthetic_export
+
+def test_set_types_are_not_truncated():
+    set_types = synthetic_export(2000, seed=1)['set_type']
+    assert set(set_types) == {'warmup', 'normal', 'failure'}
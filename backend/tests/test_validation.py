@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from synthetic_export import synthetic_export
+from validation import SetKeys, parse_dates, set_key_bases, validate_workouts_frame
+
+def workout(rows):
+    return pd.DataFrame(rows, columns=['start_time', 'exercise_title', 'set_index', 'weight_kg'])
+
+def test_set_keys_are_unique_when_an_exercise_is_logged_twice():
+    # Hevy restarts set_index for the second block of the same exercise
+    valid, _ = validate_workouts_frame(workout([
+        ['1 Jan 2024, 10:00', 'Bench Press (Barbell)', 0, 60],
+        ['1 Jan 2024, 10:00', 'Bench Press (Barbell)', 1, 70],
+        ['1 Jan 2024, 10:00', 'Bench Press (Barbell)', 0, 40],
+        ['1 Jan 2024, 10:00', 'Bench Press (Barbell)', 1, 45],
+    ]))
+    assert len(set(SetKeys().assign(valid))) == 4
+
+def test_set_keys_do_not_depend_on_chunking():
+    valid, _ = validate_workouts_frame(synthetic_export(3000, seed=3))
+    whole = SetKeys().assign(valid)
+    keys = SetKeys()
+    chunked = np.concatenate([keys.assign(valid.iloc[start:start + 700]) for start in range(0, len(valid), 700)])
+    assert (whole == chunked).all()
+    assert len(np.unique(whole)) == len(valid)
+
+def test_set_keys_match_across_exports_sharing_a_workout():
+    old = workout([['1 Jan 2024, 10:00', 'Squat (Barbell)', 0, 100], ['1 Jan 2024, 10:00', 'Squat (Barbell)', 0, 90]])
+    new = pd.concat([workout([['2 Jan 2024, 10:00', 'Squat (Barbell)', 0, 105]]), old], ignore_index=True)
+    old_keys = SetKeys().assign(validate_workouts_frame(old)[0])
+    new_keys = SetKeys().assign(validate_workouts_frame(new)[0])
+    assert list(new_keys[1:]) == list(old_keys)
+
+def test_set_keys_number_sets_without_set_index():
+    valid, _ = validate_workouts_frame(workout([
+        ['1 Jan 2024, 10:00', 'Squat (Barbell)', None, 100],
+        ['1 Jan 2024, 10:00', 'Squat (Barbell)', None, 100],
+    ]).drop(columns='set_index'))
+    assert len(set(SetKeys().assign(valid))) == 2
+
+def test_set_key_bases_ignore_parsed_dtypes():
+    a = pd.DataFrame({'start_time': pd.to_datetime(['2024-01-01 10:00']).astype('datetime64[us]'),
+                      'exercise_title': pd.Series(['Row'], dtype=object), 'set_index': [1]})
+    b = pd.DataFrame({'start_time': pd.to_datetime(['2024-01-01 10:00']).astype('datetime64[ns]'),
+                      'exercise_title': pd.Series(['Row'], dtype='string'), 'set_index': [1.0]})
+    assert (set_key_bases(a) == set_key_bases(b)).all()
+
+def test_validation_adds_no_set_keys():
+    valid, _ = validate_workouts_frame(workout([['1 Jan 2024, 10:00', 'Squat (Barbell)', 0, 100]]))
+    assert 'set_key' not in valid.columns
+
+def test_dates_outside_the_nanosecond_range_are_rejected():
+    valid, reasons = validate_workouts_frame(workout([
+        ['2 Mar 0224, 09:00', 'Squat (Barbell)', 0, 100],
+        ['1 Jan 2024, 10:00', 'Squat (Barbell)', 0, 100],
+        ['1 Jan 2400, 10:00', 'Squat (Barbell)', 0, 100],
+    ]))
+    assert list(reasons) == ['Invalid start_time', None, 'Invalid start_time']
+    assert valid['start_time'].dtype == 'datetime64[ns]'
+    assert valid['start_time'].tolist() == [pd.Timestamp('2024-01-01 10:00')]
+
+def test_dates_in_other_formats_are_parsed_one_by_one():
+    parsed = parse_dates(pd.Series(['1 Jan 2024, 10:00', '2024-01-02 10:00', '01/03/2024', '2024-01-04T10:00+02:00',
+                                    'not a date', None]))
+    assert parsed.dtype == 'datetime64[ns]'
+    assert parsed.tolist()[:4] == [pd.Timestamp('2024-01-01 10:00'), pd.Timestamp('2024-01-02 10:00'),
+                                   pd.Timestamp('2024-01-03'), pd.Timestamp('2024-01-04 08:00')]
+    assert parsed.iloc[4:].isna().all()
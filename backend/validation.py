@@ -0,0 +1,144 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['start_time', 'exercise_title']
+NUMERIC_FIELDS = ['weight_kg', 'reps', 'distance_km', 'duration_seconds', 'rpe']
+DATE_FIELDS = ['start_time', 'end_time']
+HEVY_DATE_FORMAT = '%d %b %Y, %H:%M'
+# Columns of a Hevy export, plus the set_key added by incremental and bulk imports; the fields read endpoints can project
+SET_FIELDS = ['title', 'start_time', 'end_time', 'description', 'exercise_title', 'superset_id', 'exercise_notes',
+              'set_index', 'set_type', 'weight_kg', 'reps', 'distance_km', 'duration_seconds', 'rpe', 'set_key']
+
+def validate_workout(workout):
+    """Validate workout data and handle NaN values."""
+    try:
+        # Convert NaN values to None for MongoDB compatibility
+        for key, value in workout.items():
+            if pd.isna(value) or (isinstance(value, float) and np.isnan(value)):
+                workout[key] = None
+
+        # Ensure required fields are present and have valid types
+        if not workout.get('start_time'):
+            return False, "Missing start_time"
+
+        if not workout.get('exercise_title'):
+            return False, "Missing exercise_title"
+
+        # Convert numeric fields, handling None values
+        for field in NUMERIC_FIELDS:
+            if field in workout and workout[field] is not None:
+                try:
+                    workout[field] = float(workout[field])
+                except (ValueError, TypeError):
+                    workout[field] = None
+
+        return True, workout
+    except Exception as e:
+        logger.error(f"Error validating workout: {str(e)}")
+        return False, str(e)
+
+def nanosecond_dates(parsed):
+    """Cast parsed dates to datetime64[ns], turning dates outside its range (1677-2262) into NaT.
+
+    pandas 2 already coerces those to NaT; pandas 3 keeps them at a coarser resolution,
+    which neither store nor set_key_bases can hold.
+    """
+    in_range = (parsed >= pd.Timestamp.min) & (parsed <= pd.Timestamp.max)
+    return parsed.where(in_range).astype('datetime64[ns]')
+
+def parse_dates(column):
+    """Parse a column of Hevy export dates into naive datetime64[ns], NaT where unparseable.
+
+    Values not in Hevy's format are parsed one by one; those with a UTC offset are converted to UTC.
+    """
+    parsed = nanosecond_dates(pd.to_datetime(column, format=HEVY_DATE_FORMAT, errors='coerce'))
+    mask = parsed.isna() & column.notna()
+    if mask.any():
+        fallback = pd.to_datetime(column[mask], format='mixed', utc=True, errors='coerce').dt.tz_convert(None)
+        parsed[mask] = nanosecond_dates(fallback)
+    return parsed
+
+def set_key_bases(df):
+    """64-bit hash of each row's start_time, exercise_title and set_index (NaN when the export has none).
+
+    Columns are normalized first, so the same set hashes alike whatever dtypes a chunk was parsed with.
+    """
+    start_time = df['start_time']
+    if getattr(start_time.dt, 'tz', None) is not None:
+        start_time = start_time.dt.tz_convert(None)
+    set_index = pd.to_numeric(df['set_index'], errors='coerce') if 'set_index' in df.columns else np.nan
+    columns = pd.DataFrame({
+        'start_time': start_time.astype('datetime64[ns]'),
+        'exercise_title': df['exercise_title'].astype(str),
+        'set_index': set_index,
+    }, index=df.index).astype({'set_index': 'float64'})
+    return pd.util.hash_pandas_object(columns, index=False).to_numpy()
+
+class SetKeys:
+    """Assigns set_keys to the valid rows of one export, chunk by chunk in file order.
+
+    A set is identified by its start_time, exercise_title and set_index plus its occurrence:
+    how many earlier rows of the export share those three values. Hevy restarts set_index
+    when an exercise is logged twice in a workout, and exports without set_index rely on the
+    occurrence alone. Occurrences carry over between chunks, which costs 8 bytes per set.
+    """
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def assign(self, df):
+        """set_keys for df's rows, as int64 so both stores keep them exactly."""
+        return self.keys(set_key_bases(df))
+
+    def keys(self, bases):
+        """set_keys for the next rows of the export, given their set_key_bases."""
+        bases = np.asarray(bases, dtype=np.uint64)
+        occurrence = pd.Series(bases).groupby(bases, sort=False).cumcount().to_numpy(copy=True)
+        if len(self.seen):
+            occurrence += np.searchsorted(self.seen, bases, side='right') - np.searchsorted(self.seen, bases, side='left')
+        added = np.sort(bases)
+        self.seen = np.insert(self.seen, np.searchsorted(self.seen, added), added)
+        keys = pd.util.hash_pandas_object(pd.DataFrame({'base': bases, 'occurrence': occurrence}), index=False)
+        return keys.to_numpy().view(np.int64)
+
+def validate_workouts_frame(df):
+    """Validate a DataFrame of workouts column-wise with the same rules as validate_workout.
+
+    start_time and end_time are parsed into datetimes so they are stored as BSON dates.
+    Uploads that match sets across exports add set_keys with SetKeys.
+    Returns the valid rows and an array holding a rejection reason per input row
+    (None for rows that passed).
+    """
+    df = df.copy()
+    reasons = np.full(len(df), None, dtype=object)
+
+    # Required fields are checked in reverse so the first missing field wins, as in validate_workout
+    for field in reversed(REQUIRED_FIELDS):
+        if field in df.columns:
+            column = df[field]
+            missing = (column.isna() | (column.astype(str) == '')).to_numpy()
+        else:
+            missing = np.ones(len(df), dtype=bool)
+        reasons[missing] = f"Missing {field}"
+
+    for field in DATE_FIELDS:
+        if field in df.columns:
+            parsed = parse_dates(df[field])
+            if field == 'start_time':
+                reasons[parsed.isna().to_numpy() & pd.isna(reasons)] = "Invalid start_time"
+            df[field] = parsed
+
+    for field in NUMERIC_FIELDS:
+        if field in df.columns:
+            df[field] = pd.to_numeric(df[field], errors='coerce').astype('float64')
+
+    valid = df[pd.isna(reasons)].copy()
+    return valid, reasons
+
+def frame_to_records(df):
+    """Convert a DataFrame to MongoDB-ready records, masking NaN to None."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
@@ -0,0 +1,45 @@
+"""Compare the table and embedded modes of generate_workouts_html.py.
+
+Reports build time and page size for a synthetic export. Redraw time is not
+measured here, since it needs a browser: open the pages written with --keep with
+?debug=1 and both log "Chart redraw took N ms" to the console on every redraw.
+The embedded page also shows it next to the chart controls.
+
+Usage: python benchmarks/bench_report_modes.py [rows] [--keep DIR]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'benchmarks'))
+import generate_workouts_html as report  # noqa: E402
+from bench_validation import synthetic_workouts  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int, nargs='?', default=100_000)
+    parser.add_argument('--keep', help='directory to write both pages to for in-browser comparison')
+    args = parser.parse_args()
+
+    df = synthetic_workouts(args.rows)
+    df.insert(0, 'title', 'Workout')
+    df = report.parse_date_columns(df)
+
+    print(f"rows: {args.rows}")
+    print(f"{'mode':<10}{'build (s)':>12}{'page (MB)':>12}")
+    for mode, build in [('table', report.build_table_page), ('embedded', report.build_embedded_page)]:
+        started = time.perf_counter()
+        html_content = build(df)
+        elapsed = time.perf_counter() - started
+        size = len(html_content.encode('utf-8'))
+        print(f"{mode:<10}{elapsed:>12.2f}{size / 1024 / 1024:>12.2f}")
+        if args.keep:
+            os.makedirs(args.keep, exist_ok=True)
+            with open(os.path.join(args.keep, f'workouts_{mode}.html'), 'w', encoding='utf-8') as f:
+                f.write(html_content)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""End-to-end performance benchmarks on synthetic Hevy exports.
+
+For each storage backend and size, generates (and caches under benchmarks/.data) a synthetic
+export and measures:
+- /api/upload ingest time in replace and stream modes
+- latency of /api/workouts, /api/exercises and the per-exercise reads and aggregations, cold
+  (first request after an upload) and cached
+- generate_workouts_html.py build time and output size in table and embedded modes
+
+Requests go through Flask's test client, so no server has to be running. Results are written
+as JSON to benchmarks/results/ together with the git commit, so runs can be compared across
+commits with --baseline. With several backends, each metric is also printed side by side.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 10k,100k] [--storage column,mongo]
+       [--mongo mongomock|URI] [--baseline results.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, '.data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+from synthetic_export import parse_size, write_synthetic_export  # noqa: E402
+
+def load_app(mongo, database, storages):
+    """Import the Flask app against a scratch database on mongomock or a mongod URI and a scratch column store."""
+    # Uploads replace every stored set, so never point the benchmarks at the real data
+    os.environ['MONGODB_DB'] = database
+    os.environ['COLUMN_STORE_DIR'] = os.path.join(DATA_DIR, database)
+    os.environ['STORAGE_BACKEND'] = storages[0]
+    if 'mongo' in storages and mongo == 'mongomock':
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('mongomock is not installed: pip install mongomock, or pass --mongo mongodb://...')
+        import pymongo
+        try:
+            mongomock.MongoClient().db.probe.bulk_write([pymongo.UpdateOne({'probe': 1}, {'$set': {'probe': 1}}, upsert=True)])
+        except TypeError as e:
+            # pymongo 4.11 passes a sort option to bulk updates that mongomock does not accept
+            sys.exit(f'mongomock {mongomock.__version__} cannot run bulk writes with pymongo {pymongo.version} ({e}): '
+                     "pip install 'pymongo<4.11', pass --mongo mongodb://... or use --storage column")
+        pymongo.MongoClient = mongomock.MongoClient
+    elif 'mongo' in storages:
+        os.environ['MONGODB_URI'] = mongo
+    import app as backend
+    return backend
+
+def use_storage(backend, storage):
+    """Point the app at another storage backend, returning its store."""
+    os.environ['STORAGE_BACKEND'] = storage
+    backend.connect_store()
+    return backend.store
+
+def export_path(size):
+    """Path of the cached synthetic export for size, generating it on first use."""
+    rows = parse_size(size)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'workouts_{rows}.csv')
+    if not os.path.exists(path):
+        print(f'Generating {rows} rows into {path}')
+        write_synthetic_export(path + '.tmp', rows)
+        os.replace(path + '.tmp', path)
+    return path
+
+def timed(fn, repeat=1):
+    """Median wall time of fn over repeat calls, plus the last return value."""
+    times, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def bench_upload(client, csv_bytes, mode, path='/api/upload'):
+    def upload():
+        response = client.post(f'{path}?mode={mode}',
+                               data={'file': (io.BytesIO(csv_bytes), 'workouts.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_data(as_text=True)[:200]
+        return response
+    seconds, _ = timed(upload)
+    return seconds
+
+def bench_read(client, path, repeat):
+    """Latency of the first (cold) request for path and the median of the cached ones."""
+    def fetch():
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+        return len(response.get_data())
+    cold, size = timed(fetch)
+    cached, _ = timed(fetch, repeat)
+    return cold * 1000, cached * 1000, size
+
+def bench_report(csv_path):
+    import generate_workouts_html as report
+    results = {}
+    for mode, build in [('table', report.build_table_page), ('embedded', report.build_embedded_page)]:
+        def generate():
+            return build(report.parse_date_columns(pd.read_csv(csv_path)))
+        seconds, html_content = timed(generate)
+        results[f'report_{mode}_s'] = seconds
+        results[f'report_{mode}_mb'] = len(html_content.encode('utf-8')) / 1024 / 1024
+    return results
+
+def run_size(backend, size, repeat, skip_report):
+    csv_path = export_path(size)
+    with open(csv_path, 'rb') as f:
+        csv_bytes = f.read()
+    client = backend.app.test_client()
+    results = {'rows': parse_size(size), 'csv_mb': len(csv_bytes) / 1024 / 1024}
+
+    results['upload_stream_s'] = bench_upload(client, csv_bytes, 'stream')
+    results['upload_bulk_s'] = bench_upload(client, csv_bytes, 'replace', '/api/upload/bulk')
+    # Replace mode runs last so the read benchmarks see exactly one copy of the export
+    results['upload_replace_s'] = bench_upload(client, csv_bytes, 'replace')
+    exercise = urllib.parse.quote(min(backend.store.exercises()))
+    reads = [
+        ('workouts', '/api/workouts'),
+        ('exercises', '/api/exercises'),
+        ('exercise_workouts', f'/api/workouts?exercise={exercise}'),
+        ('exercise_prs', f'/api/exercises/{exercise}/prs'),
+        ('exercise_series', f'/api/series?exercise={exercise}'),
+        ('rollups', '/api/rollups?period=week'),
+    ]
+    for name, path in reads:
+        cold, cached, body = bench_read(client, path, repeat)
+        results[f'{name}_cold_ms'] = cold
+        results[f'{name}_cached_ms'] = cached
+        results[f'{name}_response_mb'] = body / 1024 / 1024
+
+    if not skip_report:
+        results.update(bench_report(csv_path))
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Print every metric next to the baseline and return the ones that regressed past threshold."""
+    regressions = []
+    # Results from before --storage only measured MongoDB
+    baseline_runs = baseline.get('storage') or {'mongo': baseline['sizes']}
+    print(f"\n{'storage':<9}{'size':<8}{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    for storage, sizes in results['storage'].items():
+        for size, metrics in sizes.items():
+            for metric, value in metrics.items():
+                before = baseline_runs.get(storage, {}).get(size, {}).get(metric)
+                if not before or metric in ('rows', 'csv_mb'):
+                    continue
+                # Every metric is a time or a size, so growth is a regression
+                change = (value - before) / before
+                flag = '  !' if change > threshold else ''
+                if flag:
+                    regressions.append((storage, size, metric))
+                print(f"{storage:<9}{size:<8}{metric:<32}{before:>12.3f}{value:>12.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+def compare_storage(results):
+    """Print each metric for every backend side by side, relative to the first one."""
+    storages = list(results['storage'])
+    first = storages[0]
+    print(f"\n{'size':<8}{'metric':<32}" + ''.join(f'{storage:>12}' for storage in storages)
+          + ''.join(f'{storage + "/" + first:>16}' for storage in storages[1:]))
+    for size, metrics in results['storage'][first].items():
+        for metric, value in metrics.items():
+            values = [results['storage'][storage].get(size, {}).get(metric) for storage in storages]
+            ratios = [f'{other / value:>16.2f}' if other is not None and value else f"{'':>16}"
+                      for other in values[1:]]
+            print(f"{size:<8}{metric:<32}" + ''.join(f'{v:>12.3f}' if v is not None else f"{'':>12}" for v in values)
+                  + ''.join(ratios))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10k,100k', help='comma-separated sizes: 10k, 100k, 1m, 10m or row counts')
+    parser.add_argument('--storage', default='column', help='comma-separated storage backends: column, mongo '
+                                                             '(default: column, which needs no database)')
+    parser.add_argument('--mongo', default='mongomock', help="with --storage mongo: 'mongomock' or a MongoDB URI "
+                                                             "(default: mongomock, which needs pymongo<4.11)")
+    parser.add_argument('--db', default='workout_tracker_bench',
+                        help='scratch database (and benchmarks/.data column store), dropped afterwards')
+    parser.add_argument('--repeat', type=int, default=5, help='cached requests per endpoint')
+    parser.add_argument('--skip-report', action='store_true', help='skip generate_workouts_html.py builds')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<timestamp>-<commit>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    storages = args.storage.split(',')
+    backend = load_app(args.mongo, args.db, storages)
+    started = datetime.now(timezone.utc)
+    results = {
+        'commit': git_commit(),
+        'timestamp': started.isoformat(),
+        'mongo': 'mongomock' if args.mongo == 'mongomock' else 'mongod',
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'storage': {},
+    }
+    for storage in storages:
+        store = use_storage(backend, storage)
+        results['storage'][storage] = {}
+        try:
+            for size in args.sizes.split(','):
+                print(f'Benchmarking {size} on {storage}...')
+                results['storage'][storage][size] = run_size(backend, size, args.repeat, args.skip_report)
+                for metric, value in results['storage'][storage][size].items():
+                    print(f'  {metric:<32}{value:>12.3f}')
+        finally:
+            store.drop()
+    if len(storages) > 1:
+        compare_storage(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%S}-{results['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}')
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Deterministic generator for realistic Hevy workout exports.
+
+Rows are grouped into workouts of several exercises with consecutive sets, using the
+same columns and date format as a real export ("%d %b %Y, %H:%M"), with the NaNs a
+real export has (no distance/duration on lifts, no weight on cardio, optional RPE).
+
+Usage: python benchmarks/synthetic_export.py 100k --output workouts_100k.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+COLUMNS = ['title', 'start_time', 'end_time', 'description', 'exercise_title', 'superset_id',
+           'exercise_notes', 'set_index', 'set_type', 'weight_kg', 'reps', 'distance_km',
+           'duration_seconds', 'rpe']
+
+# (exercise, typical working weight in kg, or None for cardio)
+EXERCISES = [
+    ('Bench Press (Barbell)', 80), ('Squat (Barbell)', 110), ('Deadlift (Barbell)', 140),
+    ('Overhead Press (Barbell)', 50), ('Bent Over Row (Barbell)', 70), ('Pull Up', 0),
+    ('Incline Bench Press (Dumbbell)', 30), ('Lat Pulldown (Cable)', 60), ('Leg Press', 180),
+    ('Romanian Deadlift (Barbell)', 100), ('Bicep Curl (Dumbbell)', 14), ('Triceps Pushdown', 30),
+    ('Lateral Raise (Dumbbell)', 10), ('Leg Extension (Machine)', 55), ('Running', None),
+    ('Cycling', None),
+]
+WORKOUT_TITLES = ['Push', 'Pull', 'Legs', 'Upper', 'Lower', 'Full Body', 'Cardio']
+
+def parse_size(value):
+    """Accept 10k/100k/1m/10m or a plain row count."""
+    return SIZES.get(value.lower()) or int(value)
+
+START = pd.Timestamp('2015-01-01')
+# Histories are squeezed into this many days; very large exports read like several merged accounts
+MAX_SPAN_DAYS = 3650
+AVERAGE_SETS_PER_WORKOUT = 22
+
+def workout_spacing_days(total_rows):
+    """Days between consecutive workouts: every other day or so, closer for huge exports."""
+    return min(1.5, MAX_SPAN_DAYS / max(total_rows / AVERAGE_SETS_PER_WORKOUT, 1))
+
+def generate_chunk(rows, seed, chunk, first_workout, spacing_days):
+    """Generate `rows` sets starting at workout number first_workout.
+
+    Returns the DataFrame and the number of workouts it used.
+    """
+    rng = np.random.default_rng([seed, chunk])
+    # Every workout has 4-7 exercises of 3-5 sets; build slightly more than needed and trim
+    workouts = rows // 12 + 2
+    exercises_per_workout = rng.integers(4, 8, workouts)
+    exercise_slots = int(exercises_per_workout.sum())
+    sets_per_exercise = rng.integers(3, 6, exercise_slots)
+
+    workout_of_slot = np.repeat(np.arange(workouts), exercises_per_workout)
+    slot_of_set = np.repeat(np.arange(exercise_slots), sets_per_exercise)[:rows]
+    workout_of_set = workout_of_slot[slot_of_set]
+    set_index = np.arange(len(slot_of_set)) - np.repeat(np.cumsum(sets_per_exercise) - sets_per_exercise,
+                                                        sets_per_exercise)[:rows]
+
+    # Workouts start between 7:00 and 21:00 and last 45-90 minutes
+    days = (np.arange(workouts) + first_workout) * spacing_days
+    workout_start = START + pd.to_timedelta(days, unit='D') + pd.to_timedelta(rng.integers(7 * 60, 21 * 60, workouts), unit='m')
+    workout_start = workout_start.floor('min')
+    workout_end = workout_start + pd.to_timedelta(rng.integers(45, 91, workouts), unit='m')
+
+    exercise_of_slot = rng.integers(0, len(EXERCISES), exercise_slots)
+    exercise_of_set = exercise_of_slot[slot_of_set]
+    names = np.array([name for name, _ in EXERCISES], dtype=object)
+    base_weight = np.array([np.nan if weight is None else weight for _, weight in EXERCISES])
+    is_cardio = np.isnan(base_weight)[exercise_of_set]
+
+    # Slow progression over the years plus per-set noise, rounded to 2.5 kg plates
+    progression = 1 + (days[workout_of_set] / 3650)
+    weight = base_weight[exercise_of_set] * progression * rng.uniform(0.8, 1.05, rows)
+    weight = np.round(weight / 2.5) * 2.5
+    reps = rng.integers(1, 13, rows).astype(float)
+    reps[is_cardio] = np.nan
+    distance = np.where(is_cardio, np.round(rng.uniform(2, 12, rows), 2), np.nan)
+    duration = np.where(is_cardio, rng.integers(900, 3600, rows), np.nan)
+    rpe = np.where(rng.random(rows) < 0.4, rng.integers(6, 11, rows), np.nan)
+
+    titles = np.array(WORKOUT_TITLES, dtype=object)[rng.integers(0, len(WORKOUT_TITLES), workouts)]
+    set_types = np.where(set_index == 0, 'warmup', 'normal').astype(object)
+    set_types[rng.random(rows) < 0.03] = 'failure'
+
+    df = pd.DataFrame({
+        'title': titles[workout_of_set],
+        'start_time': workout_start.strftime('%d %b %Y, %H:%M')[workout_of_set],
+        'end_time': workout_end.strftime('%d %b %Y, %H:%M')[workout_of_set],
+        'description': np.nan,
+        'exercise_title': names[exercise_of_set],
+        'superset_id': np.nan,
+        'exercise_notes': np.nan,
+        'set_index': set_index,
+        'set_type': set_types,
+        'weight_kg': weight,
+        'reps': reps,
+        'distance_km': distance,
+        'duration_seconds': duration,
+        'rpe': rpe,
+    }, columns=COLUMNS)
+    return df, int(workout_of_set[-1]) + 1 if rows else 0
+
+def synthetic_chunks(rows, seed=0, chunk_rows=1_000_000):
+    """Yield the export in DataFrame chunks; the same arguments always yield the same rows."""
+    spacing_days = workout_spacing_days(rows)
+    written = first_workout = chunk = 0
+    while written < rows:
+        count = min(chunk_rows, rows - written)
+        # Each chunk starts on a fresh workout so dates keep increasing across chunks
+        df, used = generate_chunk(count, seed, chunk, first_workout, spacing_days)
+        yield df
+        written += count
+        first_workout += used
+        chunk += 1
+
+def synthetic_export(rows, seed=0):
+    """DataFrame of `rows` sets formatted exactly like a Hevy CSV export."""
+    return pd.concat(list(synthetic_chunks(rows, seed)), ignore_index=True)
+
+def write_synthetic_export(path, rows, seed=0):
+    """Write a synthetic export to path chunk by chunk so 10M-row files need little memory."""
+    for i, chunk in enumerate(synthetic_chunks(rows, seed)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('size', help='10k, 100k, 1m, 10m or a row count')
+    parser.add_argument('--output', help='CSV path (default: workouts_<size>.csv)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = parse_size(args.size)
+    path = args.output or f'workouts_{args.size.lower()}.csv'
+    write_synthetic_export(path, rows, seed=args.seed)
+    print(f'Wrote {rows} rows to {path}')
+
+if __name__ == '__main__':
+    main()
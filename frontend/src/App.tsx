@@ -97,6 +97,16 @@ interface Workout {
   rpe?: number;
 }
 
+// Chart series from /api/series: parallel arrays, with nulls for gap-filled days
+interface Series {
+  x: (string | number)[];
+  y: (number | null)[];
+  date: (string | null)[];
+  gap: boolean[];
+  total_points: number;
+  step_days: number | null;
+}
+
 // API URL configuration - automatically detect server address
 const getApiUrl = () => {
   const hostname = window.location.hostname;
@@ -116,6 +126,9 @@ const getApiUrl = () => {
 
 const API_URL = getApiUrl();
 
+// Maximum number of points requested for the chart, however long the history is
+const SERIES_POINTS = 1000;
+
 function AppContent({ workouts, setWorkouts }: { workouts: Workout[], setWorkouts: React.Dispatch<React.SetStateAction<Workout[]>> }) {
   const navigate = useNavigate();
   const [exercises, setExercises] = useState<string[]>([]);
@@ -280,71 +293,39 @@ function AppContent({ workouts, setWorkouts }: { workouts: Workout[], setWorkout
     navigate(`/workout/${date}`);
   };
 
-  const getChartData = useMemo(() => {
-    if (!workoutData.length) {
-      return {
-        datasets: [{
-          label: `${yAxis} vs ${xAxis}`,
-          data: [],
-          borderColor: '#1976d2',
-          backgroundColor: 'rgba(25, 118, 210, 0.2)',
-        }]
-      };
-    }
+  const [series, setSeries] = useState<Series | null>(null);
 
-    let filteredWorkouts = [...workoutData];
-    if (showTopSets) {
-      const topSets = new Map<string, Workout>();
-      filteredWorkouts.forEach(workout => {
-        const key = `${workout.start_time}-${workout.exercise_title}`;
-        if (!topSets.has(key) || workout.weight_kg > topSets.get(key)!.weight_kg) {
-          topSets.set(key, workout);
-        }
+  useEffect(() => {
+    // The server sorts, gap-fills and downsamples the series, so the chart never gets more than SERIES_POINTS points
+    const params = new URLSearchParams({
+      exercise: selectedExercise,
+      x: xAxis,
+      y: yAxis,
+      points: String(SERIES_POINTS)
+    });
+    if (showTopSets) params.set('top_sets', '1');
+    if (evenDateSpacing && xAxis === 'start_time') params.set('even_spacing', '1');
+
+    let cancelled = false;
+    axios.get(`${API_URL}/api/series?${params}`)
+      .then(response => {
+        if (!cancelled) setSeries(response.data);
+      })
+      .catch(error => {
+        console.error('Error fetching chart series:', error);
+        if (!cancelled) setSeries(null);
       });
-      filteredWorkouts = Array.from(topSets.values());
-    }
-
-    // Sort workouts by date
-    filteredWorkouts.sort((a, b) => new Date(a.start_time).getTime() - new Date(b.start_time).getTime());
-
-    // If even date spacing is enabled and x-axis is start_time
-    if (evenDateSpacing && xAxis === 'start_time') {
-      const dates = filteredWorkouts.map(w => new Date(w.start_time));
-      const minDate = new Date(Math.min(...dates.map(d => d.getTime())));
-      const maxDate = new Date(Math.max(...dates.map(d => d.getTime())));
-      
-      // Create evenly spaced dates
-      const numPoints = filteredWorkouts.length;
-      const timeStep = (maxDate.getTime() - minDate.getTime()) / (numPoints - 1);
-      
-      // Create new array with evenly spaced dates
-      const data = filteredWorkouts.map((workout, index) => ({
-        x: new Date(minDate.getTime() + timeStep * index),
-        y: Number(workout[yAxis as keyof Workout]) || 0,
-        originalDate: workout.start_time
-      }));
-
-      return {
-        datasets: [{
-          label: `${yAxis} vs ${xAxis}`,
-          data,
-          borderColor: '#1976d2',
-          backgroundColor: 'rgba(25, 118, 210, 0.2)',
-        }]
-      };
-    }
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedExercise, xAxis, yAxis, showTopSets, evenDateSpacing, workouts]);
 
-    // For non-even date spacing or non-time x-axis
-    const data = filteredWorkouts.map(w => {
-      const xValue = w[xAxis as keyof Workout];
-      const yValue = w[yAxis as keyof Workout];
-      
-      return {
-        x: xAxis === 'start_time' ? new Date(xValue as string) : Number(xValue) || 0,
-        y: Number(yValue) || 0,
-        originalDate: w.start_time
-      };
-    });
+  const getChartData = useMemo(() => {
+    const data = series ? series.x.map((x, index) => ({
+      x: xAxis === 'start_time' ? new Date(x as string) : Number(x),
+      y: series.y[index] as number,
+      originalDate: series.date[index]
+    })) : [];
 
     return {
       datasets: [{
@@ -352,9 +333,13 @@ function AppContent({ workouts, setWorkouts }: { workouts: Workout[], setWorkout
         data,
         borderColor: '#1976d2',
         backgroundColor: 'rgba(25, 118, 210, 0.2)',
+        // Segments spanning more than a week without training are drawn in red
+        segment: {
+          borderColor: (context: any) => series?.gap[context.p1DataIndex] ? 'rgba(255, 0, 0, 0.5)' : undefined
+        }
       }]
     };
-  }, [workoutData, showTopSets, xAxis, yAxis, evenDateSpacing]);
+  }, [series, xAxis, yAxis]);
 
   const getLineChartData = () => getChartData as ChartData<'line', { x: Date | number; y: number }[]>;
   const getBarChartData = () => getChartData as ChartData<'bar', { x: Date | number; y: number }[]>;
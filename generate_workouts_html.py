@@ -1,38 +1,60 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
 import pandas as pd
 
-# Read the CSV file
-df = pd.read_csv('workouts.csv')
-
-# Convert start_time and end_time to readable date format if they look like timestamps
-for col in ['start_time', 'end_time']:
-    if col in df.columns:
-        # Try to parse with the known format first
-        df[col] = pd.to_datetime(df[col], format='%d %b %Y, %H:%M', errors='coerce')
-        # If any are still NaT, try generic parsing as fallback
-        mask = df[col].isna()
-        if mask.any():
-            df.loc[mask, col] = pd.to_datetime(df.loc[mask, col], errors='coerce')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from validation import parse_dates  # noqa: E402
+
+# Identify numeric columns for graphing
+GRAPHABLE_COLUMNS = ['weight_kg', 'reps', 'distance_km', 'duration_seconds', 'rpe']
+DATE_COLUMNS = ['start_time', 'end_time']
+
+def parse_date_columns(df):
+    """Parse start_time and end_time into datetimes in place, as the backend does on upload."""
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    return df
+
+def dates_are_date_only(column):
+    """Whether a parsed date column is shown without a time of day."""
+    return bool(column.dt.hour.fillna(0).eq(0).all() and column.dt.minute.fillna(0).all())
+
+def format_date_columns(df):
+    """Convert parsed date columns to readable strings in place."""
+    for col in DATE_COLUMNS:
         # Format as string after all .dt operations
-        if df[col].notna().any():
-            if (df[col].dt.hour.fillna(0).eq(0).all() and df[col].dt.minute.fillna(0).all()):
+        if col in df.columns and df[col].notna().any():
+            if dates_are_date_only(df[col]):
                 df[col] = df[col].dt.strftime('%Y-%m-%d')
             else:
                 df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M')
+    return df
 
-# Identify numeric columns for graphing
-graphable_columns = ['weight_kg', 'reps', 'distance_km', 'duration_seconds', 'rpe']
+def build_table_page(df):
+    """Page with the whole DataFrame rendered as an HTML table that the scripts read back from the DOM."""
+    df = format_date_columns(df.copy())
+    graphable_columns = GRAPHABLE_COLUMNS
 
-# Get all columns for X-axis selection
-all_columns = df.columns.tolist()
+    # Get all columns for X-axis selection
+    all_columns = df.columns.tolist()
 
-# Get unique exercises for the filter dropdown
-exercise_list = sorted(df['exercise_title'].dropna().unique())
+    # Get unique exercises for the filter dropdown
+    exercise_list = sorted(df['exercise_title'].dropna().unique())
 
-# Generate HTML table
-html_table = df.to_html(index=False, table_id="workoutsTable", classes="display nowrap", escape=False)
+    # Generate HTML table
+    html_table = df.to_html(index=False, table_id="workoutsTable", classes="display nowrap", escape=False)
 
-# HTML template with DataTables and Chart.js
-html_content = f'''
+    # HTML template with DataTables and Chart.js
+    html_content = f'''
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -91,6 +113,8 @@ html_content = f'''
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script>
         var table;
+        // Open the page with ?debug=1 to log chart redraw times to the console
+        var DEBUG = new URLSearchParams(window.location.search).has('debug');
         $(document).ready(function() {{
             table = $('#workoutsTable').DataTable({{
                 scrollX: true,
@@ -251,6 +275,7 @@ html_content = f'''
         var chart = null;  // Initialize chart variable
 
         function updateChart() {{
+            var redrawStart = performance.now();
             var xCol = $('#xAxisSelect').val();
             var yCol = $('#yAxisSelect').val();
             var type = $('#chartType').val();
@@ -344,6 +369,408 @@ html_content = f'''
             }};
 
             chart = new Chart(ctx, chartConfig);
+            if (DEBUG) {{
+                console.log('Chart redraw took ' + (performance.now() - redrawStart).toFixed(1) + ' ms');
+            }}
+        }}
+
+        $('#xAxisSelect, #yAxisSelect, #chartType, #evenDateSpacing').on('change', updateChart);
+    </script>
+</body>
+</html>
+'''
+    return html_content
+
+def epoch_millis(column):
+    """Epoch milliseconds for a datetime column, None where missing."""
+    millis = (column - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return millis.astype(object).where(column.notna(), None).tolist()
+
+def build_report_data(df):
+    """Precompute the columnar payload the embedded page renders from.
+
+    Dates become epoch milliseconds, exercise titles are dictionary-encoded, and the
+    top-set flags and per-exercise row orderings are computed once here instead of
+    on every dropdown change in the browser.
+    """
+    df = df.reset_index(drop=True)
+    exercise_codes, exercises = pd.factorize(df['exercise_title'], sort=True)
+
+    values = {}
+    for col in df.columns:
+        if col == 'exercise_title':
+            continue
+        if col in DATE_COLUMNS and pd.api.types.is_datetime64_any_dtype(df[col]):
+            values[col] = epoch_millis(df[col])
+        else:
+            values[col] = df[col].astype(object).where(df[col].notna(), None).tolist()
+
+    # Top set: heaviest set per (start_time, exercise_title); the first one wins ties
+    heaviest_first = df.sort_values('weight_kg', ascending=False, kind='stable', na_position='last')
+    top_set = np.zeros(len(df), dtype=np.int8)
+    top_set[heaviest_first.drop_duplicates(['start_time', 'exercise_title']).index.to_numpy()] = 1
+
+    # Row indices in chronological order, overall and per exercise
+    order = np.argsort(df['start_time'].to_numpy(), kind='stable') if 'start_time' in df.columns else np.arange(len(df))
+    ordered_codes = exercise_codes[order]
+    series = [order[ordered_codes == code].tolist() for code in range(len(exercises))]
+
+    return {
+        'length': len(df),
+        'columns': df.columns.tolist(),
+        'dateOnly': {col: dates_are_date_only(df[col]) for col in DATE_COLUMNS
+                     if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col])},
+        'exercises': exercises.tolist(),
+        'exercise': exercise_codes.tolist(),
+        'values': values,
+        'topSet': top_set.tolist(),
+        'order': order.tolist(),
+        'series': series,
+    }
+
+def build_embedded_page(df):
+    """Page that embeds the data as a compact JSON blob and renders table and chart from it."""
+    data = build_report_data(df)
+    # Escape "</" so the blob cannot close its script tag
+    data_json = json.dumps(data, separators=(',', ':')).replace('</', '<\\/')
+    data_html = f'<script type="application/json" id="workoutData">{data_json}</script>'
+    data_js = """var DATA = JSON.parse(document.getElementById('workoutData').textContent);
+        function withData(exercise, callback) {
+            callback();
+        }"""
+    return render_data_page(data['columns'], data['exercises'], data_html, data_js, include_all=True)
+
+def render_data_page(all_columns, exercise_list, data_html, data_js, include_all):
+    """Report page that renders table and chart from DATA, which data_js provides through withData()."""
+    graphable_columns = GRAPHABLE_COLUMNS
+    all_option = '<option value="All">All Exercises</option>' if include_all else ''
+
+    html_content = f'''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Workout Data Viewer</title>
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 40px; }}
+        #chart-container {{ 
+            width: 95vw; 
+            max-width: 1200px; 
+            height: 600px;  /* Increased height */
+            margin: 40px auto; 
+        }}
+        table.dataTable {{ width: 100% !important; }}
+        #redrawTime {{ color: #888; margin-left: 20px; }}
+    </style>
+</head>
+<body>
+    <h1>Workout Data Viewer</h1>
+    <div>
+        <label for="exerciseSelect">Filter by exercise:</label>
+        <select id="exerciseSelect">
+            {all_option}
+            {''.join([f'<option value="{ex}">{ex}</option>' for ex in exercise_list])}
+        </select>
+    </div>
+    <div style="margin-top: 20px;">
+        <label for="xAxisSelect">X axis:</label>
+        <select id="xAxisSelect">
+            {''.join([f'<option value="{col}">{col}</option>' for col in all_columns])}
+        </select>
+        <label for="yAxisSelect">Y axis:</label>
+        <select id="yAxisSelect">
+            {''.join([f'<option value="{col}">{col}</option>' for col in graphable_columns])}
+        </select>
+        <select id="chartType">
+            <option value="line">Line</option>
+            <option value="bar">Bar</option>
+            <option value="scatter">Scatter</option>
+        </select>
+        <label style="margin-left: 20px;">
+            <input type="checkbox" id="evenDateSpacing"> Show even date spacing
+        </label>
+        <span id="redrawTime"></span>
+    </div>
+    <div id="chart-container">
+        <canvas id="workoutChart"></canvas>
+    </div>
+    <label style="margin-left:20px;">
+        <input type="checkbox" id="topSetOnly"> Show only top set (highest weight per date & exercise)
+    </label>
+    <table id="workoutsTable" class="display nowrap"></table>
+    {data_html}
+    <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+    <script src="https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <script>
+        var COLUMNS = {json.dumps(all_columns)};
+        var DAY_MS = 1000 * 60 * 60 * 24;
+        var visibleRows = [];  // Row indices of DATA matching the filters, oldest first
+        var sortCache = {{}};
+        var table;
+        var chart = null;
+        // Open the page with ?debug=1 to show and log chart redraw times
+        var DEBUG = new URLSearchParams(window.location.search).has('debug');
+
+        {data_js}
+
+        function isDateColumn(col) {{
+            return col in DATA.dateOnly;
+        }}
+
+        function pad(n) {{
+            return n < 10 ? '0' + n : '' + n;
+        }}
+
+        function formatDate(col, ms) {{
+            var d = new Date(ms);
+            var day = d.getUTCFullYear() + '-' + pad(d.getUTCMonth() + 1) + '-' + pad(d.getUTCDate());
+            return DATA.dateOnly[col] ? day : day + ' ' + pad(d.getUTCHours()) + ':' + pad(d.getUTCMinutes());
+        }}
+
+        function cellValue(col, i) {{
+            if (col === 'exercise_title') {{
+                var code = DATA.exercise[i];
+                return code < 0 ? null : DATA.exercises[code];
+            }}
+            return DATA.values[col][i];
+        }}
+
+        function cellText(col, i) {{
+            var value = cellValue(col, i);
+            if (value === null || value === undefined) return '';
+            return isDateColumn(col) ? formatDate(col, value) : String(value);
+        }}
+
+        function applyFilters(done) {{
+            var val = $('#exerciseSelect').val();
+            withData(val, function() {{
+                // Ignore data arriving for a selection that has since changed
+                if ($('#exerciseSelect').val() !== val) return;
+                var index = DATA.exercises.indexOf(val);
+                var rows = index < 0 ? DATA.order : DATA.series[index];
+                if ($('#topSetOnly').is(':checked')) {{
+                    rows = rows.filter(function(i) {{ return DATA.topSet[i] === 1; }});
+                }}
+                visibleRows = rows;
+                sortCache = {{}};
+                table.draw();
+                if (done) done();
+            }});
+        }}
+
+        function sortedRows(rows, col, dir, cacheable) {{
+            var key = col + ':' + dir;
+            if (cacheable && key in sortCache) return sortCache[key];
+            var result;
+            if (col === 'start_time') {{
+                // Visible rows are already in chronological order
+                result = dir === 'asc' ? rows : rows.slice().reverse();
+            }} else {{
+                var sign = dir === 'asc' ? 1 : -1;
+                result = rows.slice().sort(function(a, b) {{
+                    var va = cellValue(col, a), vb = cellValue(col, b);
+                    if (va === vb) return 0;
+                    if (va === null) return 1;
+                    if (vb === null) return -1;
+                    return (va < vb ? -1 : 1) * sign;
+                }});
+            }}
+            if (cacheable) sortCache[key] = result;
+            return result;
+        }}
+
+        // Only the rows of the current page are ever turned into table cells
+        function renderPage(request, callback) {{
+            if (!DATA) {{
+                callback({{ draw: request.draw, recordsTotal: 0, recordsFiltered: 0, data: [] }});
+                return;
+            }}
+            var rows = visibleRows;
+            var term = request.search.value.toLowerCase();
+            if (term) {{
+                rows = rows.filter(function(i) {{
+                    return COLUMNS.some(function(col) {{ return cellText(col, i).toLowerCase().indexOf(term) !== -1; }});
+                }});
+            }}
+            if (request.order.length) {{
+                var order = request.order[0];
+                rows = sortedRows(rows, COLUMNS[order.column], order.dir, !term);
+            }}
+            var end = request.length < 0 ? rows.length : request.start + request.length;
+            callback({{
+                draw: request.draw,
+                recordsTotal: DATA.length,
+                recordsFiltered: rows.length,
+                data: rows.slice(request.start, end).map(function(i) {{
+                    return COLUMNS.map(function(col) {{ return cellText(col, i); }});
+                }})
+            }});
+        }}
+
+        $(document).ready(function() {{
+            table = $('#workoutsTable').DataTable({{
+                serverSide: true,
+                ajax: renderPage,
+                columns: COLUMNS.map(function(col) {{ return {{ title: col }}; }}),
+                scrollX: true,
+                searchDelay: 300,
+                lengthMenu: [[10, 25, 50, 100, -1], [10, 25, 50, 100, 'All']],
+                pageLength: 25,
+                order: [[0, 'desc']]  // Sort by first column (usually date) by default
+            }});
+
+            $('#exerciseSelect, #topSetOnly').on('change', function() {{
+                applyFilters(updateChart);
+            }});
+
+            // Initial table and chart update
+            applyFilters(updateChart);
+        }});
+
+        function getXYData(xCol, yCol) {{
+            var rows = visibleRows;
+            var dateAxis = isDateColumn(xCol);
+            if (dateAxis && xCol !== 'start_time') {{
+                rows = rows.slice().sort(function(a, b) {{ return cellValue(xCol, a) - cellValue(xCol, b); }});
+            }}
+
+            var xData = [];
+            var yData = [];
+            var actualDates = [];  // Epoch ms of each data point
+            rows.forEach(function(i) {{
+                var xVal = cellValue(xCol, i);
+                var yVal = cellValue(yCol, i);
+                if (yVal !== null && !isNaN(yVal) && xVal !== null && xVal !== '') {{
+                    xData.push(dateAxis ? formatDate(xCol, xVal) : xVal);
+                    yData.push(yVal);
+                    actualDates.push(dateAxis ? xVal : null);
+                }}
+            }});
+
+            // If even date spacing is enabled, emit one entry per calendar day in the range
+            if (dateAxis && $('#evenDateSpacing').is(':checked') && actualDates.length > 0) {{
+                var firstDay = Math.floor(actualDates[0] / DAY_MS);
+                var lastDay = Math.floor(actualDates[actualDates.length - 1] / DAY_MS);
+                var days = lastDay - firstDay + 1;
+                var newXData = new Array(days);
+                var newYData = new Array(days).fill(null);
+                var newActualDates = new Array(days).fill(null);
+                for (var d = 0; d < days; d++) {{
+                    newXData[d] = new Date((firstDay + d) * DAY_MS).toISOString().split('T')[0];
+                }}
+                actualDates.forEach(function(ms, i) {{
+                    var d = Math.floor(ms / DAY_MS) - firstDay;
+                    newYData[d] = yData[i];
+                    newActualDates[d] = ms;
+                }});
+                xData = newXData;
+                yData = newYData;
+                actualDates = newActualDates;
+            }}
+
+            return {{ x: xData, y: yData, actualDates: actualDates }};
+        }}
+
+        function updateChart() {{
+            if (!DATA) return;
+            var redrawStart = performance.now();
+            var xCol = $('#xAxisSelect').val();
+            var yCol = $('#yAxisSelect').val();
+            var type = $('#chartType').val();
+            var xyData = getXYData(xCol, yCol);
+            var dateAxis = isDateColumn(xCol);
+
+            // Destroy existing chart if it exists
+            if (chart) {{
+                chart.destroy();
+            }}
+
+            var ctx = document.getElementById('workoutChart').getContext('2d');
+
+            // Calculate segment colors based on time gaps
+            var segmentColors = [];
+            if (dateAxis) {{
+                var previous = null;
+                xyData.actualDates.forEach(function(ms, i) {{
+                    if (xyData.y[i] === null) return;
+                    if (previous !== null) {{
+                        segmentColors.push((ms - previous) / DAY_MS > 7 ? 'rgba(255, 0, 0, 0.5)' : 'rgba(54, 162, 235, 0.5)');
+                    }}
+                    previous = ms;
+                }});
+            }}
+
+            var maxY = 0;
+            xyData.y.forEach(function(y) {{ if (y !== null && y > maxY) maxY = y; }});
+
+            var chartConfig = {{
+                type: type === 'scatter' ? 'scatter' : type,
+                data: {{
+                    labels: type === 'scatter' ? undefined : xyData.x,
+                    datasets: [{{
+                        label: yCol + ' vs ' + xCol,
+                        data: type === 'scatter' ? xyData.x.map((x, i) => ({{
+                            x: dateAxis ? xyData.actualDates[i] : parseFloat(x),
+                            y: xyData.y[i]
+                        }})) : xyData.y,
+                        backgroundColor: 'rgba(54, 162, 235, 0.5)',
+                        borderColor: function(context) {{
+                            if (type === 'scatter') return 'rgba(54, 162, 235, 1)';
+                            var index = context.dataIndex;
+                            if (index < segmentColors.length) {{
+                                return segmentColors[index];
+                            }}
+                            return 'rgba(54, 162, 235, 1)';
+                        }},
+                        borderWidth: 2,
+                        fill: false,
+                        showLine: type !== 'scatter',
+                        spanGaps: true,
+                        segment: {{
+                            borderColor: function(context) {{
+                                if (type === 'scatter') return 'rgba(54, 162, 235, 1)';
+                                return segmentColors[context.p0DataIndex] || 'rgba(54, 162, 235, 1)';
+                            }}
+                        }}
+                    }}]
+                }},
+                options: {{
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    animation: false,
+                    plugins: {{
+                        legend: {{ display: true }}
+                    }},
+                    scales: {{
+                        x: type === 'scatter' ? {{
+                            title: {{ display: true, text: xCol }},
+                            type: 'linear',
+                            position: 'bottom'
+                        }} : {{
+                            title: {{ display: true, text: xCol }},
+                            ticks: {{
+                                maxRotation: 45,
+                                minRotation: 45
+                            }}
+                        }},
+                        y: {{
+                            beginAtZero: true,
+                            title: {{ display: true, text: yCol }},
+                            suggestedMin: 0,
+                            suggestedMax: maxY * 1.1  // Add 10% padding to the top
+                        }}
+                    }}
+                }}
+            }};
+
+            chart = new Chart(ctx, chartConfig);
+            if (DEBUG) {{
+                var elapsed = (performance.now() - redrawStart).toFixed(1);
+                $('#redrawTime').text('Redraw: ' + elapsed + ' ms');
+                console.log('Chart redraw took ' + elapsed + ' ms');
+            }}
         }}
 
         $('#xAxisSelect, #yAxisSelect, #chartType, #evenDateSpacing').on('change', updateChart);
@@ -351,8 +778,213 @@ html_content = f'''
 </body>
 </html>
 '''
+    return html_content
+
+def hash_file(path, prefix_size=None):
+    """SHA-256 and size of a file, plus the SHA-256 of its first prefix_size bytes when requested."""
+    block_size = 1024 * 1024
+    digest = hashlib.sha256()
+    prefix_digest = None
+    with open(path, 'rb') as f:
+        if prefix_size is not None:
+            remaining = prefix_size
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+            if remaining == 0:
+                prefix_digest = digest.hexdigest()
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+        size = f.tell()
+    return digest.hexdigest(), prefix_digest, size
+
+def shard_key(exercise):
+    return hashlib.sha1(exercise.encode('utf-8')).hexdigest()[:16]
+
+def shard_file_name(exercise):
+    return shard_key(exercise) + '.js'
+
+def frame_cache_path(cache_dir, exercise):
+    return os.path.join(cache_dir, 'frames', shard_key(exercise) + '.pkl')
+
+def load_workouts_cached(csv_path, cache_dir):
+    """Parse only the rows appended to the export since the cached build.
+
+    The parsed rows are cached as one pandas pickle per exercise, next to a meta.json
+    holding the CSV's SHA-256, the columns, the exercises and which date columns are
+    date-only. When the new CSV starts with exactly the bytes of the cached one, only
+    the appended tail is parsed and only the touched exercises' pickles are rewritten.
+    Checking that still reads (but does not parse) the whole file once.
+
+    Returns (frames, meta, status): frames maps every exercise with new rows to all
+    of its rows, and is empty when the export is unchanged.
+    """
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if 'exercises' not in meta:
+            # Written by an older version that cached one pickle for the whole export
+            meta = {}
+
+    csv_hash, prefix_hash, size = hash_file(csv_path, meta.get('csv_size'))
+    if meta.get('csv_hash') == csv_hash:
+        return {}, meta, 'unchanged'
+
+    if meta and prefix_hash == meta['csv_hash'] and meta.get('ends_with_newline'):
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            f.seek(meta['csv_size'])
+            tail = f.read()
+        appended = parse_date_columns(pd.read_csv(io.BytesIO(header + tail)))
+        frames = {}
+        for exercise, rows in appended.groupby('exercise_title', sort=True):
+            path = frame_cache_path(cache_dir, exercise)
+            if os.path.exists(path):
+                rows = pd.concat([pd.read_pickle(path), rows], ignore_index=True)
+            frames[exercise] = rows
+        # A column stays date-only only while every appended date has no time of day either
+        date_only = {col: value and (not pd.api.types.is_datetime64_any_dtype(appended[col])
+                                     or dates_are_date_only(appended[col]))
+                     for col, value in meta['dateOnly'].items()}
+        exercises = sorted(set(meta['exercises']) | set(frames))
+        status = f'appended {len(appended)} rows'
+    else:
+        df = parse_date_columns(pd.read_csv(csv_path))
+        frames = dict(iter(df.groupby('exercise_title', sort=True)))
+        date_only = {col: dates_are_date_only(df[col]) for col in DATE_COLUMNS
+                     if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col])}
+        exercises = list(frames)
+        status = f'parsed {len(df)} rows'
+        meta = {'columns': df.columns.tolist()}
+        if os.path.isdir(os.path.join(cache_dir, 'frames')):
+            shutil.rmtree(os.path.join(cache_dir, 'frames'))
+
+    os.makedirs(os.path.join(cache_dir, 'frames'), exist_ok=True)
+    for exercise, rows in frames.items():
+        rows.to_pickle(frame_cache_path(cache_dir, exercise))
+    with open(csv_path, 'rb') as f:
+        f.seek(max(size - 1, 0))
+        ends_with_newline = f.read(1) == b'\n'
+    meta.update({'csv_hash': csv_hash, 'csv_size': size, 'ends_with_newline': ends_with_newline,
+                 'exercises': exercises, 'dateOnly': date_only})
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return frames, meta, status
+
+def build_sharded_report(frames, meta, output_dir, cache_dir=None):
+    """Write one data shard per exercise plus an index page that loads shards on selection.
+
+    Only shards of exercises in frames are rewritten, each from all of that exercise's
+    rows; others are rebuilt from the cache only when missing or when a date column's
+    display format changed. Returns the number of shards written.
+    """
+    cache_dir = cache_dir or os.path.join(output_dir, '.cache')
+    shards_dir = os.path.join(output_dir, 'shards')
+    os.makedirs(shards_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, 'shards.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    date_only = meta['dateOnly']
+    written = 0
+    shards = {}
+    for exercise in meta['exercises']:
+        name = shard_file_name(exercise)
+        entry = manifest.get(exercise)
+        rows = frames.get(exercise)
+        if rows is None and (entry is None or entry.get('dateOnly') != date_only
+                             or not os.path.exists(os.path.join(shards_dir, name))):
+            rows = pd.read_pickle(frame_cache_path(cache_dir, exercise))
+        if rows is not None:
+            data = build_report_data(rows)
+            data['dateOnly'] = date_only
+            payload = json.dumps(data, separators=(',', ':'))
+            with open(os.path.join(shards_dir, name), 'w', encoding='utf-8') as f:
+                f.write(f'receiveShard({json.dumps(name)}, {payload});\n')
+            entry = {'file': name, 'version': hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12],
+                     'dateOnly': date_only}
+            written += 1
+        shards[exercise] = entry
+
+    # Drop shards of exercises that no longer appear in the export
+    current = {entry['file'] for entry in shards.values()}
+    for name in os.listdir(shards_dir):
+        if name not in current:
+            os.remove(os.path.join(shards_dir, name))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(shards, f)
+
+    shard_index = {exercise: {'file': entry['file'], 'version': entry['version']} for exercise, entry in shards.items()}
+    data_js = """var DATA = null;
+        var SHARDS = %s;
+        var loadedShards = {};
+        var pendingShards = {};
+        window.receiveShard = function(name, data) {
+            loadedShards[name] = data;
+            (pendingShards[name] || []).forEach(function(callback) { callback(); });
+            delete pendingShards[name];
+        };
+        // Load an exercise's shard with a script tag (works from file:// too) and make it DATA
+        function withData(exercise, callback) {
+            var shard = SHARDS[exercise];
+            var done = function() { DATA = loadedShards[shard.file]; callback(); };
+            if (shard.file in loadedShards) {
+                done();
+                return;
+            }
+            if (!(shard.file in pendingShards)) {
+                pendingShards[shard.file] = [];
+                var script = document.createElement('script');
+                script.src = 'shards/' + shard.file + '?v=' + shard.version;
+                document.head.appendChild(script);
+            }
+            pendingShards[shard.file].push(done);
+        }""" % json.dumps(shard_index)
+    html_content = render_data_page(meta['columns'], list(shards), '', data_js, include_all=False)
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate an interactive HTML report from a Hevy workouts export.')
+    parser.add_argument('--input', default='workouts.csv', help='Hevy CSV export to read')
+    parser.add_argument('--output', help='HTML file to write (directory in sharded mode); '
+                                         'defaults to workouts.html, or workouts_report/ in sharded mode')
+    parser.add_argument('--mode', choices=['table', 'embedded', 'sharded'], default='table',
+                        help='table: render every row into the HTML table; '
+                             'embedded: embed precomputed columnar data and render the table page by page; '
+                             'sharded: write per-exercise data shards and rebuild only what changed')
+    parser.add_argument('--cache-dir', help='parsed-data cache for sharded mode (default: OUTPUT/.cache)')
+    args = parser.parse_args()
+
+    if args.mode == 'sharded':
+        output_dir = args.output or 'workouts_report'
+        cache_dir = args.cache_dir or os.path.join(output_dir, '.cache')
+        started = time.perf_counter()
+        frames, meta, status = load_workouts_cached(args.input, cache_dir)
+        written = build_sharded_report(frames, meta, output_dir, cache_dir)
+        print(f'{status}, rewrote {written} shard(s) in {time.perf_counter() - started:.2f}s')
+        print(f'{os.path.join(output_dir, "index.html")} generated! Open it in your browser.')
+        return
+
+    args.output = args.output or 'workouts.html'
+    # Read the CSV file
+    df = parse_date_columns(pd.read_csv(args.input))
+    html_content = build_embedded_page(df) if args.mode == 'embedded' else build_table_page(df)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(html_content)
 
-with open('workouts.html', 'w', encoding='utf-8') as f:
-    f.write(html_content)
+    print(f'{args.output} generated! Open it in your browser.')
 
-print('workouts.html generated! Open it in your browser.') 
\ No newline at end of file
+if __name__ == '__main__':
+    main()